@@ -1,64 +1,208 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.background import BackgroundTask
 
+from app.auth.crud.token import RevokedTokensCrudDep
 from app.auth.crud.user import UsersCrudDep
+from app.auth.exporter import (
+    EXPORT_COLUMNS,
+    EXPORT_MEDIA_TYPES,
+    ExportFormat,
+    export_users,
+)
+from app.auth.importer import (
+    IMPORT_MEDIA_TYPES,
+    BodyTooLargeError,
+    import_users,
+    iter_file,
+    spool_body,
+)
 from app.auth.jwt import (
     authenticate_user,
+    check_login_rate_limit,
     create_token_set,
     get_admin_user,
     get_current_user,
+    rotate_refresh_token,
     validate_refresh_token,
 )
 from app.auth.models.jwt import RefreshTokenReq, Token
-from app.auth.models.user import User, UserCreate, UserDetailResp, UserPatch, UserRead
+from app.auth.models.user import (
+    Principal,
+    UserCreate,
+    UserDetailResp,
+    UserPage,
+    UserPatch,
+    UserRead,
+)
+from app.core.conditional import ConditionalGet, conditional_get
+from app.core.config import settings
 from app.core.models import DetailResp
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.responses import ModelJSONResponse
 
 router = APIRouter()
-GetCurrentUserDep = Annotated[User, Depends(get_current_user)]
+GetCurrentUserDep = Annotated[Principal, Depends(get_current_user)]
+ConditionalGetDep = Annotated[ConditionalGet, conditional_get()]
 
 
 @router.post("/users", status_code=status.HTTP_201_CREATED, response_model=UserRead)
 async def register_user(auth_data: UserCreate, users_crud: UsersCrudDep):
     user = await users_crud.create(auth_data)
-    return user
+    return ModelJSONResponse(
+        UserRead.model_validate(user), status_code=status.HTTP_201_CREATED
+    )
+
+
+@router.get("/users", response_model=UserPage)
+async def list_users(
+    user: Annotated[UserRead, Depends(get_admin_user)],
+    users_crud: UsersCrudDep,
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+    cursor: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    is_admin: Optional[bool] = None,
+    email_prefix: Optional[str] = None,
+):
+    after = None
+    if cursor is not None:
+        created_at, user_id = decode_cursor(cursor, size=2)
+        try:
+            after = (datetime.fromisoformat(created_at), UUID(user_id))
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+
+    # One extra row tells whether there is a next page
+    users = await users_crud.get_page(
+        limit=limit + 1,
+        after=after,
+        is_active=is_active,
+        is_admin=is_admin,
+        email_prefix=email_prefix,
+    )
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1].created_at, users[-1].id)
+    return {"items": users, "next_cursor": next_cursor}
+
+
+@router.post("/users/import", response_class=StreamingResponse)
+async def bulk_import_users(
+    request: Request,
+    user: Annotated[UserRead, Depends(get_admin_user)],
+    users_crud: UsersCrudDep,
+):
+    """
+    Import users from an NDJSON or CSV body with email, password or
+    password_hash, is_active and is_admin fields. The response streams one
+    NDJSON result per row and a final summary.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if media_type not in IMPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content type must be one of {', '.join(IMPORT_MEDIA_TYPES)}",
+        )
+    try:
+        body = await spool_body(
+            request.stream(), max_size=settings.USER_IMPORT_MAX_BODY_BYTES
+        )
+    except BodyTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.args[0]
+        )
+    return StreamingResponse(
+        import_users(iter_file(body), media_type, users_crud),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(body.close),
+    )
+
+
+@router.get("/users/export", response_class=StreamingResponse)
+async def export_users_dump(
+    user: Annotated[UserRead, Depends(get_admin_user)],
+    users_crud: UsersCrudDep,
+    export_format: Annotated[ExportFormat, Query(alias="format")] = "csv",
+    gzip: bool = False,
+):
+    """
+    Stream the public fields of every user as CSV or NDJSON.
+    """
+    partitions = users_crud.stream(
+        EXPORT_COLUMNS, fetch_size=settings.USER_EXPORT_FETCH_SIZE
+    )
+    headers = {"Content-Disposition": f'attachment; filename="users.{export_format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_users(partitions, export_format, gzip=gzip),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers=headers,
+    )
 
 
 @router.get("/users/me", response_model=UserRead)
-async def get_my_account(user: GetCurrentUserDep):
-    return user
+async def get_my_account(user: GetCurrentUserDep, conditional: ConditionalGetDep):
+    return conditional.respond(user.etag, lambda: ModelJSONResponse(user))
 
 
-@router.post("/token", response_model=Token)
+@router.post(
+    "/token", response_model=Token, dependencies=[Depends(check_login_rate_limit)]
+)
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     users_crud: UsersCrudDep,
+    background_tasks: BackgroundTasks,
 ):
     user = await authenticate_user(
         form_data.username,
         form_data.password,
         users_crud=users_crud,
+        background_tasks=background_tasks,
     )
-    return create_token_set(user.id)
+    return ModelJSONResponse(create_token_set(user.id, user=user))
 
 
 @router.put("/token", response_model=Token)
-async def refresh_token(incoming_token: RefreshTokenReq, user: GetCurrentUserDep):
+async def refresh_token(
+    incoming_token: RefreshTokenReq,
+    user: GetCurrentUserDep,
+    users_crud: UsersCrudDep,
+    tokens_crud: RevokedTokensCrudDep,
+):
     decoded_token = validate_refresh_token(incoming_token.refresh_token)
     if decoded_token.sub != user.id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
         )
-    return create_token_set(user.id)
+    token = await rotate_refresh_token(
+        decoded_token, users_crud=users_crud, tokens_crud=tokens_crud
+    )
+    return ModelJSONResponse(token)
 
 
 @router.delete("/users/{target_user_id}", response_model=DetailResp)
 async def delete_user(
     target_user_id: UUID,
-    user: Annotated[User, Depends(get_admin_user)],
+    user: Annotated[UserRead, Depends(get_admin_user)],
     users_crud: UsersCrudDep,
 ):
     if target_user_id == user.id:
@@ -80,4 +224,8 @@ async def update_user(
             detail="You can't update this user",
         )
     user = await users_crud.update(user.id, user_patch)
-    return {"detail": f"User {user.email} updated", "user": user}
+    return ModelJSONResponse(
+        UserDetailResp(
+            detail=f"User {user.email} updated", user=UserRead.model_validate(user)
+        )
+    )
@@ -0,0 +1,41 @@
+import sys
+
+from app.auth.models.user import Principal
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import cache_entries, cache_lookups
+
+principal_cache: TTLCache[str, Principal] = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECS,
+)
+
+# Lowest token version each worker still accepts for a user. Entries only need
+# to outlive the access tokens they reject.
+token_versions: TTLCache[str, int] = TTLCache(
+    maxsize=settings.TOKEN_VERSION_CACHE_MAX_SIZE,
+    ttl=settings.JWT_ACCESS_TOKEN_EXPIRE_SECS,
+)
+
+
+def revoke_tokens(user_id: str, before_version: int = sys.maxsize):
+    """
+    Reject stateless access tokens of a user whose version is lower than
+    ``before_version``, every token of the user by default.
+    """
+    principal_cache.invalidate(user_id)
+    token_versions.set(user_id, before_version)
+
+
+def collect_metrics():
+    """
+    Copy the cache statistics into the metrics registry, before a scrape.
+    """
+    for name, cache in (
+        ("principal", principal_cache),
+        ("token_version", token_versions),
+    ):
+        stats = cache.stats
+        cache_entries.set(stats["size"], name)
+        cache_lookups.set_total(stats["hits"], name, "hit")
+        cache_lookups.set_total(stats["misses"], name, "miss")
@@ -0,0 +1,126 @@
+"""
+Measure password hashing on this host and pick the highest cost that fits a
+latency budget per hash.
+
+Usage:
+    python -m app.auth.calibrate [--target-ms 250] [--scheme bcrypt]
+        [--memory-kib 65536] [--parallelism 4] [--repeat 3]
+
+Prints the chosen policy as environment variables for Config. Run it on the
+hardware class that serves logins; hashes of a lower cost are upgraded on
+the next login of their user.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from app.auth.security import create_pwd_context
+
+# Lowest costs considered acceptable, whatever the budget
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 20
+MIN_ARGON2_MEMORY_KIB = 19 * 1024
+MAX_ARGON2_TIME_COST = 20
+
+
+def measure(repeat: int, **policy) -> float:
+    """
+    Return the median time in seconds of hashing a password with ``policy``.
+    """
+    pwd_context = create_pwd_context(**policy)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pwd_context.hash("calibration password")
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def report(policy: dict, elapsed: float):
+    values = ", ".join(f"{name}={value}" for name, value in policy.items())
+    print(f"{values}: {elapsed * 1000:8.1f} ms", file=sys.stderr)
+
+
+def calibrate_bcrypt(target: float, repeat: int) -> dict:
+    # Every round doubles the cost, stop at the first one over the budget
+    chosen = {"PASSWORD_BCRYPT_ROUNDS": MIN_BCRYPT_ROUNDS}
+    for rounds in range(MIN_BCRYPT_ROUNDS, MAX_BCRYPT_ROUNDS + 1):
+        elapsed = measure(repeat, scheme="bcrypt", bcrypt_rounds=rounds)
+        report({"rounds": rounds}, elapsed)
+        if elapsed > target:
+            break
+        chosen["PASSWORD_BCRYPT_ROUNDS"] = rounds
+    return {"PASSWORD_HASH_SCHEME": "bcrypt", **chosen}
+
+
+def calibrate_argon2(
+    target: float, repeat: int, memory_kib: int, parallelism: int
+) -> dict:
+    # Memory is the main defense against GPUs, it's only lowered when a
+    # single pass doesn't fit the budget; passes are added while they fit
+    time_cost = 1
+    while True:
+        policy = {
+            "argon2_time_cost": time_cost,
+            "argon2_memory_cost": memory_kib,
+            "argon2_parallelism": parallelism,
+        }
+        elapsed = measure(repeat, scheme="argon2", **policy)
+        report(policy, elapsed)
+        if elapsed <= target:
+            if time_cost >= MAX_ARGON2_TIME_COST:
+                break
+            time_cost += 1
+        elif time_cost > 1:
+            time_cost -= 1
+            break
+        elif memory_kib > MIN_ARGON2_MEMORY_KIB:
+            memory_kib = max(memory_kib // 2, MIN_ARGON2_MEMORY_KIB)
+        else:
+            break
+
+    return {
+        "PASSWORD_HASH_SCHEME": "argon2",
+        "PASSWORD_ARGON2_TIME_COST": time_cost,
+        "PASSWORD_ARGON2_MEMORY_KIB": memory_kib,
+        "PASSWORD_ARGON2_PARALLELISM": parallelism,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=250,
+        help="Latency budget of one hash in milliseconds",
+    )
+    parser.add_argument("--scheme", choices=("bcrypt", "argon2"), default="bcrypt")
+    parser.add_argument("--memory-kib", type=int, default=64 * 1024)
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.scheme == "argon2":
+        from passlib.hash import argon2
+
+        if not argon2.has_backend():
+            parser.error("argon2 requires the argon2-cffi package")
+
+    target = args.target_ms / 1000
+    if args.scheme == "bcrypt":
+        policy = calibrate_bcrypt(target, args.repeat)
+    else:
+        policy = calibrate_argon2(
+            target, args.repeat, args.memory_kib, args.parallelism
+        )
+    for name, value in policy.items():
+        print(f"{name}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Signing and verification of compact JSON Web Tokens.
+
+Each key is a codec of one algorithm, parsed once when it's created. A
+KeyRing signs with one key and verifies with any key it holds, selected by
+the ``kid`` header, so keys can be rotated without invalidating the tokens
+signed with the previous one. The public keys are exported as a JWKS for
+other services to verify tokens locally.
+
+cryptography is only imported for asymmetric keys, HS256 uses the standard
+library.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Literal
+
+Algorithm = Literal["HS256", "RS256", "EdDSA"]
+
+
+class JWTError(Exception):
+    pass
+
+
+class ExpiredSignatureError(JWTError):
+    pass
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _int_to_b64(value: int) -> str:
+    return b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big")).decode()
+
+
+def _json_bytes(value: dict) -> bytes:
+    return json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+
+
+class JWTCodec(ABC):
+    alg: str
+
+    def __init__(self, kid: str | None):
+        self.kid = kid or self.default_kid()
+
+    @property
+    @abstractmethod
+    def can_sign(self) -> bool: ...
+
+    @abstractmethod
+    def default_kid(self) -> str: ...
+
+    @abstractmethod
+    def sign(self, signing_input: bytes) -> bytes: ...
+
+    @abstractmethod
+    def verify(self, signing_input: bytes, signature: bytes) -> bool: ...
+
+    def public_jwk(self) -> dict | None:
+        """
+        Return the public key as a JWK, None for keys that must stay secret.
+        """
+        return None
+
+
+class HS256Codec(JWTCodec):
+    alg = "HS256"
+    can_sign = True
+
+    def __init__(self, secret: str, kid: str | None = None):
+        self._secret = secret.encode()
+        super().__init__(kid)
+
+    def default_kid(self) -> str:
+        # Must not reveal anything about the secret
+        digest = hashlib.sha256(b"kid:" + self._secret).digest()
+        return b64encode(digest[:12]).decode()
+
+    def sign(self, signing_input: bytes) -> bytes:
+        return hmac.digest(self._secret, signing_input, "sha256")
+
+    def verify(self, signing_input: bytes, signature: bytes) -> bool:
+        return hmac.compare_digest(self.sign(signing_input), signature)
+
+
+class AsymmetricCodec(JWTCodec):
+    """
+    Codec of a PEM encoded key pair, or of a public key that only verifies.
+    """
+
+    def __init__(self, pem: str, kid: str | None = None):
+        from cryptography.hazmat.primitives import serialization
+
+        data = pem.encode()
+        if b"PRIVATE KEY" in data:
+            self._private_key = serialization.load_pem_private_key(data, password=None)
+            self._public_key = self._private_key.public_key()
+        else:
+            self._private_key = None
+            self._public_key = serialization.load_pem_public_key(data)
+        self._check_key_type()
+        super().__init__(kid)
+
+    @property
+    def can_sign(self) -> bool:
+        return self._private_key is not None
+
+    @abstractmethod
+    def _check_key_type(self): ...
+
+    def default_kid(self) -> str:
+        # RFC 7638 thumbprint of the public key
+        jwk = self.public_jwk()
+        required = {name: jwk[name] for name in self.thumbprint_members}
+        return b64encode(hashlib.sha256(_json_bytes(required)).digest()).decode()
+
+    def verify(self, signing_input: bytes, signature: bytes) -> bool:
+        from cryptography.exceptions import InvalidSignature
+
+        try:
+            self._verify(signing_input, signature)
+        except InvalidSignature:
+            return False
+        return True
+
+    @abstractmethod
+    def _verify(self, signing_input: bytes, signature: bytes): ...
+
+
+class RS256Codec(AsymmetricCodec):
+    alg = "RS256"
+    thumbprint_members = ("e", "kty", "n")
+
+    def _check_key_type(self):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+        if not isinstance(self._public_key, rsa.RSAPublicKey):
+            raise ValueError("RS256 requires an RSA key")
+        self._padding = padding.PKCS1v15()
+        self._hash = hashes.SHA256()
+
+    def sign(self, signing_input: bytes) -> bytes:
+        return self._private_key.sign(signing_input, self._padding, self._hash)
+
+    def _verify(self, signing_input: bytes, signature: bytes):
+        self._public_key.verify(signature, signing_input, self._padding, self._hash)
+
+    def public_jwk(self) -> dict:
+        numbers = self._public_key.public_numbers()
+        return {"kty": "RSA", "n": _int_to_b64(numbers.n), "e": _int_to_b64(numbers.e)}
+
+
+class EdDSACodec(AsymmetricCodec):
+    """
+    EdDSA over Ed25519, the only curve supported.
+    """
+
+    alg = "EdDSA"
+    thumbprint_members = ("crv", "kty", "x")
+
+    def _check_key_type(self):
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+
+        if not isinstance(self._public_key, ed25519.Ed25519PublicKey):
+            raise ValueError("EdDSA requires an Ed25519 key")
+
+    def sign(self, signing_input: bytes) -> bytes:
+        return self._private_key.sign(signing_input)
+
+    def _verify(self, signing_input: bytes, signature: bytes):
+        self._public_key.verify(signature, signing_input)
+
+    def public_jwk(self) -> dict:
+        from cryptography.hazmat.primitives import serialization
+
+        raw = self._public_key.public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw
+        )
+        return {"kty": "OKP", "crv": "Ed25519", "x": b64encode(raw).decode()}
+
+
+CODECS: dict[str, type[JWTCodec]] = {
+    "HS256": HS256Codec,
+    "RS256": RS256Codec,
+    "EdDSA": EdDSACodec,
+}
+
+
+def create_codec(alg: Algorithm, key: str, kid: str | None = None) -> JWTCodec:
+    """
+    Parse a key: the secret for HS256, a PEM private or public key otherwise.
+    """
+    return CODECS[alg](key, kid=kid)
+
+
+class KeyRing:
+    """
+    Sign tokens with ``signing_key`` and verify them with any of the keys.
+
+    Tokens without a ``kid`` header, issued before keys had ids, are verified
+    with the first key of their algorithm.
+    """
+
+    def __init__(self, signing_key: JWTCodec, verification_keys=()):
+        if not signing_key.can_sign:
+            raise ValueError(f"Key {signing_key.kid} has no private key")
+        self.signing_key = signing_key
+        # Tells the tokens verified by this key ring apart in caches
+        self.id = uuid.uuid4().hex
+        self._keys: dict[str, JWTCodec] = {}
+        self._keys_by_alg: dict[str, JWTCodec] = {}
+        for key in (signing_key, *verification_keys):
+            if key.kid in self._keys:
+                raise ValueError(f"Duplicate key id {key.kid}")
+            self._keys[key.kid] = key
+            self._keys_by_alg.setdefault(key.alg, key)
+
+        header = {"alg": signing_key.alg, "kid": signing_key.kid, "typ": "JWT"}
+        self._header_segment = b64encode(_json_bytes(header))
+        jwks = [
+            {**jwk, "kid": key.kid, "alg": key.alg, "use": "sig"}
+            for key in self._keys.values()
+            if (jwk := key.public_jwk()) is not None
+        ]
+        # Served as is, it only changes with the keys
+        self.jwks = _json_bytes({"keys": jwks})
+
+    def encode(self, claims: dict) -> str:
+        payload_segment = b64encode(_json_bytes(claims))
+        signing_input = self._header_segment + b"." + payload_segment
+        signature = self.signing_key.sign(signing_input)
+        return (signing_input + b"." + b64encode(signature)).decode()
+
+    def decode(self, token: str) -> dict:
+        """
+        Verify a token and return its claims.
+
+        Raises:
+            ExpiredSignatureError: If the token has expired.
+            JWTError: If the token is malformed, its key is unknown or its
+                signature is invalid.
+        """
+        try:
+            signing_input, signature_segment = token.encode().rsplit(b".", 1)
+            header_segment, payload_segment = signing_input.split(b".")
+            header = json.loads(b64decode(header_segment))
+            signature = b64decode(signature_segment)
+        except ValueError:
+            raise JWTError("Invalid token")
+        if not isinstance(header, dict):
+            raise JWTError("Invalid header")
+        alg = header.get("alg")
+        kid = header.get("kid")
+        if not isinstance(alg, str) or not isinstance(kid, (str, type(None))):
+            raise JWTError("Invalid header")
+
+        key = self._keys.get(kid) if kid is not None else self._keys_by_alg.get(alg)
+        # The algorithm is the key's, never the one the token claims
+        if key is None or key.alg != alg:
+            raise JWTError("Unknown signing key")
+        if not key.verify(signing_input, signature):
+            raise JWTError("Signature verification failed.")
+
+        try:
+            claims = json.loads(b64decode(payload_segment))
+        except ValueError:
+            raise JWTError("Invalid payload")
+        if not isinstance(claims, dict):
+            raise JWTError("Invalid payload")
+        exp = claims.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise JWTError("Expiration Time claim (exp) must be a number.")
+            if exp <= time.time():
+                raise ExpiredSignatureError("Signature has expired.")
+        return claims
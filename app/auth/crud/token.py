@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import Depends
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from app.auth.models.token import RevokedToken
+from app.core.db import get_async_session
+
+
+def utc_now():
+    # expires_at holds naive UTC datetimes, like the exp claims it comes from
+    return func.timezone("UTC", func.now())
+
+
+class RevokedTokensCRUD:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def revoke(self, jti: UUID, user_id: UUID, expires_at: datetime) -> bool:
+        """
+        Revoke a refresh token. Concurrent calls for the same token are
+        serialized by its primary key, so only one of them succeeds.
+
+        Args:
+            jti (UUID): The jti claim of the token.
+            user_id (UUID): The subject of the token.
+            expires_at (datetime): When the token expires, as naive UTC.
+
+        Returns:
+            bool: False if the token was already revoked.
+        """
+        stmt = (
+            insert(RevokedToken)
+            .values(jti=jti, user_id=user_id, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+            .returning(RevokedToken.jti)
+        )
+        result = await self.session.execute(statement=stmt)
+        revoked = result.scalar_one_or_none() is not None
+        await self.session.commit()
+
+        return revoked
+
+
+async def get_revoked_tokens_crud(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> RevokedTokensCRUD:
+    return RevokedTokensCRUD(session=session)
+
+
+RevokedTokensCrudDep = Annotated[RevokedTokensCRUD, Depends(get_revoked_tokens_crud)]
@@ -1,17 +1,56 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, Any, AsyncIterator, Optional, Sequence
 from uuid import UUID
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import delete, select
+from sqlalchemy import (
+    Column,
+    Row,
+    RowMapping,
+    any_,
+    func,
+    literal,
+    not_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
+from app.auth.cache import revoke_tokens
 from app.auth.models.user import User, UserCreate, UserPatch
-from app.core.db import get_async_session
+from app.auth.security import password_hasher
+from app.core.config import settings
+from app.core.db import (
+    REPLICA_ERRORS,
+    get_async_read_session,
+    get_async_session,
+    replica_router,
+)
+from app.core.loader import BatchLoader
 
 
 class UsersCRUD:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, read_session: AsyncSession | None = None):
         self.session = session
+        self.read_session = read_session or session
+
+    async def _execute_read(self, stmt):
+        """
+        Run a read-only statement on the read replica, falling back to the
+        primary if the replica is unavailable.
+        """
+        replica = self.read_session.info.get("replica")
+        if replica is None or not replica.healthy:
+            return await self.session.execute(statement=stmt)
+
+        try:
+            return await self.read_session.execute(statement=stmt)
+        except REPLICA_ERRORS:
+            replica_router.mark_unhealthy(replica)
+            return await self.session.execute(statement=stmt)
 
     async def create(self, data: UserCreate) -> User:
         """
@@ -22,21 +61,61 @@ class UsersCRUD:
 
         Returns:
             User: The newly created user object.
+
+        Raises:
+            HTTPException: If a user with the same email already exists.
         """
-        await self.check_user_unique_fields(data)
+        values = data.model_dump()
+        values["password"] = await password_hasher.hash(data.password)
+        # A single INSERT ... RETURNING, the unique index on email rejects duplicates
+        stmt = insert(User).values(**values).returning(User)
+        try:
+            result = await self.session.execute(statement=stmt)
+            user = result.scalar_one()
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="User with this email already exists",
+            )
+
+        return user
 
-        user = User(**data.model_dump())
-        self.session.add(user)
+    async def bulk_create(self, rows: list[dict]) -> set[str]:
+        """
+        Insert many users with a single multi-row INSERT, skipping emails that already exist.
+
+        Args:
+            rows (list[dict]): Column values of the users to insert. Passwords must already be hashed.
+
+        Returns:
+            set[str]: The emails of the users that were actually inserted.
+        """
+        if not rows:
+            return set()
+
+        stmt = (
+            insert(User.__table__)
+            .values(rows)
+            .on_conflict_do_nothing(
+                index_elements=[User.email], index_where=not_(User.is_deleted)
+            )
+            .returning(User.email)
+        )
+        result = await self.session.execute(statement=stmt)
+        created = set(result.scalars())
         await self.session.commit()
-        await self.session.refresh(user)
 
-        return user
+        return created
 
-    async def get(self, **kwargs) -> User:
+    async def get(self, *, primary: bool = False, **kwargs) -> User:
         """
         Retrieve a user from the database based on the provided parameters.
 
         Args:
+            primary (bool): Read from the primary instead of a replica, for reads that must see the latest writes.
+                Replica reads of a single id or email are coalesced with concurrent lookups and return a transient user.
             **kwargs: A dictionary of keyword arguments that can include the user's ID, username, or email.
 
         Returns:
@@ -49,11 +128,22 @@ class UsersCRUD:
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid key",
                 )
-        stmt = select(User).where(
-            *(getattr(User, key) == kwargs[key] for key in kwargs)
-        )
-        results = await self.session.execute(statement=stmt)
-        user = results.scalar_one_or_none()
+        if not primary and settings.USER_LOOKUP_COALESCING and len(kwargs) == 1:
+            # Shares the query of concurrent lookups in this worker
+            ((key, value),) = kwargs.items()
+            row = await user_loaders[key].load(_lookup_key(key, value), self)
+            # Every caller gets its own transient copy
+            user = None if row is None else User(**row)
+        else:
+            stmt = select(User).where(
+                not_(User.is_deleted),
+                *(getattr(User, key) == kwargs[key] for key in kwargs),
+            )
+            if primary:
+                results = await self.session.execute(statement=stmt)
+            else:
+                results = await self._execute_read(stmt)
+            user = results.scalar_one_or_none()
 
         if user is None:
             raise HTTPException(
@@ -63,6 +153,90 @@ class UsersCRUD:
 
         return user
 
+    async def get_rows(self, key: str, values: list) -> dict[Any, RowMapping]:
+        """
+        Retrieve the users matching any of the given values of a column with a single query.
+
+        Args:
+            key (str): The column to match, "id" or "email".
+            values (list): The values to look up.
+
+        Returns:
+            dict: The column values of every user found, by the value it matched.
+        """
+        column = getattr(User, key)
+        stmt = select(*User.__table__.columns).where(
+            not_(User.is_deleted),
+            # One statement whatever the number of values
+            column == any_(literal(values, ARRAY(column.type))),
+        )
+        results = await self._execute_read(stmt)
+        return {row[key]: row for row in results.mappings()}
+
+    async def get_page(
+        self,
+        *,
+        limit: int,
+        after: Optional[tuple[datetime, UUID]] = None,
+        is_active: Optional[bool] = None,
+        is_admin: Optional[bool] = None,
+        email_prefix: Optional[str] = None,
+    ) -> list[User]:
+        """
+        List users ordered by creation time, continuing after a given row.
+
+        Args:
+            limit (int): The maximum number of users to return.
+            after (tuple[datetime, UUID], optional): The (created_at, id) of the last user of the previous page.
+            is_active (bool, optional): Only return users with this active flag.
+            is_admin (bool, optional): Only return users with this admin flag.
+            email_prefix (str, optional): Only return users whose email starts with this prefix.
+
+        Returns:
+            list[User]: The users of the page.
+        """
+        stmt = (
+            select(User)
+            .where(not_(User.is_deleted))
+            .order_by(User.created_at, User.id)
+            .limit(limit)
+        )
+        if after is not None:
+            # Row comparison lets Postgres seek straight into the composite index
+            stmt = stmt.where(tuple_(User.created_at, User.id) > tuple_(*after))
+        if is_active is not None:
+            stmt = stmt.where(User.is_active == is_active)
+        if is_admin is not None:
+            stmt = stmt.where(User.is_admin == is_admin)
+        if email_prefix:
+            stmt = stmt.where(User.email.startswith(email_prefix, autoescape=True))
+
+        results = await self._execute_read(stmt)
+        return list(results.scalars())
+
+    async def stream(
+        self, columns: Sequence[Column], fetch_size: int
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Stream the given columns of all users through a server-side cursor without building ORM objects.
+
+        Args:
+            columns (Sequence[Column]): The columns of the user table to fetch.
+            fetch_size (int): The number of rows fetched per round trip.
+
+        Yields:
+            Sequence[Row]: Partitions of at most fetch_size rows.
+        """
+        stmt = (
+            select(*columns)
+            .where(not_(User.is_deleted))
+            .order_by(User.created_at, User.id)
+            .execution_options(yield_per=fetch_size)
+        )
+        result = await self.read_session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
     async def update(self, user_id: str | UUID, user_patch: UserPatch) -> User:
         """
         Update a user in the database based on the provided user ID.
@@ -74,63 +248,152 @@ class UsersCRUD:
         Returns:
             User: The updated user.
 
+        Raises:
+            HTTPException: If the user doesn't exist or the new email is already taken.
         """
 
         update_data = user_patch.model_dump(exclude_none=True, exclude_unset=True)
-        print(f"{update_data=}")
         target_user_id = (
             update_data.pop("user_id") if "user_id" in update_data else user_id
         )
-        user = await self.get(id=target_user_id)
-        for k, v in update_data.items():
-            setattr(user, k, v)
+        if "password" in update_data:
+            update_data["password"] = await password_hasher.hash(
+                update_data["password"]
+            )
+        stmt = (
+            update(User)
+            .where(User.id == target_user_id, not_(User.is_deleted))
+            # Outdated role claims in stateless access tokens stop being accepted
+            .values(**update_data, token_version=User.token_version + 1)
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
+        try:
+            result = await self.session.execute(statement=stmt)
+            user = result.scalar_one_or_none()
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="User with this email already exists",
+            )
 
-        self.session.add(user)
-        await self.session.commit()
-        await self.session.refresh(user)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        revoke_tokens(str(user.id), before_version=user.token_version)
 
         return user
 
-    async def delete(self, user_id: str | UUID) -> bool:
+    async def revoke_all_tokens(self, user_id: str | UUID):
         """
-        Delete a user from the database based on the provided user ID.
+        Revoke every token issued to a user so far by bumping its token version.
 
         Args:
-            user_id (str or UUID): The ID of the user to be deleted.
+            user_id (str or UUID): The ID of the user.
+        """
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(token_version=User.token_version + 1)
+            .returning(User.token_version)
+        )
+        result = await self.session.execute(statement=stmt)
+        version = result.scalar_one_or_none()
+        await self.session.commit()
+        if version is not None:
+            revoke_tokens(str(user_id), before_version=version)
 
-        Returns:
-            bool: True if the user was successfully deleted from the database.
+    async def update_password_hash(
+        self, user_id: str | UUID, old_hash: str, new_hash: str
+    ) -> bool:
         """
-        stmt = delete(User).where(User.id == user_id)
+        Replace the hash of an unchanged password with one of the current policy.
 
-        await self.session.execute(statement=stmt)
+        Args:
+            user_id (str or UUID): The ID of the user.
+            old_hash (str): The hash the new one was computed for.
+            new_hash (str): The new hash of the same password.
+
+        Returns:
+            bool: False if the password was changed in the meantime.
+        """
+        # Tokens stay valid, the password itself didn't change
+        stmt = (
+            update(User)
+            .where(User.id == user_id, User.password == old_hash)
+            .values(password=new_hash)
+        )
+        result = await self.session.execute(statement=stmt)
         await self.session.commit()
 
-        return True
+        return result.rowcount > 0
 
-    async def check_user_unique_fields(self, user: UserCreate):
+    async def delete(self, user_id: str | UUID) -> bool:
         """
-        Check if a user with the same username or email already exists in the database.
+        Soft delete a user based on the provided user ID. The row is removed later by the purge job.
 
         Args:
-            user (UserCreate): The data of the user to be checked for uniqueness. It includes the username and email.
+            user_id (str or UUID): The ID of the user to be deleted.
+
+        Returns:
+            bool: True if the user was successfully deleted.
 
         Raises:
-            HTTPException: If a user with the same username or email already exists.
+            HTTPException: If the user doesn't exist.
         """
-        stmt = select(User.id).where(User.email == user.email)
+        stmt = (
+            update(User)
+            .where(User.id == user_id, not_(User.is_deleted))
+            .values(
+                is_deleted=True,
+                # Same clock as the purge job compares it with
+                deleted_at=func.localtimestamp(),
+                token_version=User.token_version + 1,
+            )
+            .returning(User.id)
+        )
+
         result = await self.session.execute(statement=stmt)
-        if result.scalars().first():
+        deleted_id = result.scalar_one_or_none()
+        await self.session.commit()
+        if deleted_id is None:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User with this email already exists",
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
             )
+        revoke_tokens(str(user_id))
+
+        return True
+
+
+def _lookup_key(key: str, value: Any):
+    # Lookups by str and by UUID of the same id share the query
+    if key == "id" and not isinstance(value, UUID):
+        return UUID(str(value))
+    return value
+
+
+user_loaders: dict[str, BatchLoader[Any, RowMapping, UsersCRUD]] = {
+    "id": BatchLoader(
+        lambda ids, users_crud: users_crud.get_rows("id", ids),
+        max_batch_size=settings.USER_LOOKUP_MAX_BATCH_SIZE,
+    ),
+    "email": BatchLoader(
+        lambda emails, users_crud: users_crud.get_rows("email", emails),
+        max_batch_size=settings.USER_LOOKUP_MAX_BATCH_SIZE,
+    ),
+}
 
 
 async def get_users_crud(
     session: Annotated[AsyncSession, Depends(get_async_session)],
+    read_session: Annotated[AsyncSession, Depends(get_async_read_session)],
 ) -> UsersCRUD:
-    return UsersCRUD(session=session)
+    return UsersCRUD(session=session, read_session=read_session)
 
 
 UsersCrudDep = Annotated[UsersCRUD, Depends(get_users_crud)]
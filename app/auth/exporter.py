@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Literal, Sequence
+
+from sqlalchemy import Row
+
+from app.auth.models.user import User
+
+ExportFormat = Literal["csv", "ndjson"]
+EXPORT_MEDIA_TYPES: dict[ExportFormat, str] = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+# The fields of UserRead, internal columns such as the password hash or the
+# token version never leave the service
+EXPORT_COLUMNS = (
+    User.__table__.c.id,
+    User.__table__.c.email,
+    User.__table__.c.is_admin,
+    User.__table__.c.is_active,
+)
+
+
+def serialize_csv(rows: Sequence[Row], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(column.name for column in EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def serialize_ndjson(rows: Sequence[Row]) -> str:
+    return "".join(json.dumps(row._asdict(), default=str) + "\n" for row in rows)
+
+
+async def export_users(
+    partitions: AsyncIterator[Sequence[Row]],
+    export_format: ExportFormat,
+    gzip: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Serialize partitions of user rows into CSV or NDJSON chunks, optionally
+    gzip-compressed on the fly.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if gzip else None
+    header = True
+    async for rows in partitions:
+        if export_format == "csv":
+            chunk = serialize_csv(rows, header=header).encode()
+            header = False
+        else:
+            chunk = serialize_ndjson(rows).encode()
+
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+
+    if export_format == "csv" and header:
+        chunk = serialize_csv([], header=True).encode()
+        yield compressor.compress(chunk) if compressor is not None else chunk
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,209 @@
+import csv
+import json
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, BinaryIO
+
+from pydantic import ValidationError
+
+from app.auth.crud.user import UsersCRUD
+from app.auth.models.user import UserImport
+from app.auth.security import password_hasher
+from app.core.config import settings
+
+IMPORT_MEDIA_TYPES = ("application/x-ndjson", "text/csv")
+CHUNK_SIZE = 64 * 1024
+
+
+class BodyTooLargeError(Exception):
+    pass
+
+
+async def spool_body(stream: AsyncIterator[bytes], max_size: int) -> BinaryIO:
+    """
+    Copy a request body into a temporary file that only stays in memory while
+    it is small.
+
+    The body can't be read while a StreamingResponse is being sent, since the
+    response listens for the client disconnecting on the same channel.
+
+    Raises:
+        BodyTooLargeError: If the body is larger than ``max_size`` bytes.
+    """
+    file = SpooledTemporaryFile(max_size=CHUNK_SIZE * 16)
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+        if size > max_size:
+            file.close()
+            raise BodyTooLargeError(f"Body is larger than {max_size} bytes")
+        file.write(chunk)
+    file.seek(0)
+    return file
+
+
+async def iter_file(file: BinaryIO) -> AsyncIterator[bytes]:
+    while chunk := file.read(CHUNK_SIZE):
+        yield chunk
+
+
+def decode_line(line: bytes) -> str | None:
+    try:
+        return line.decode().rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+
+async def iter_lines(
+    stream: AsyncIterator[bytes], max_length: int
+) -> AsyncIterator[str | None]:
+    """
+    Split a body into lines, yielding None for the lines that aren't UTF-8 or
+    are longer than ``max_length`` bytes. The rest of a line is discarded as
+    soon as it's too long, so memory use doesn't depend on the body.
+    """
+    parts: list[bytes] = []
+    length = 0
+    oversized = False
+    async for chunk in stream:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+            if not oversized:
+                length += len(piece)
+                if length > max_length:
+                    oversized = True
+                    parts = []
+                else:
+                    parts.append(piece)
+            if end == -1:
+                break
+            yield None if oversized else decode_line(b"".join(parts))
+            parts, length, oversized = [], 0, False
+            start = end + 1
+    if length or oversized:
+        yield None if oversized else decode_line(b"".join(parts))
+
+
+async def iter_records(
+    stream: AsyncIterator[bytes], media_type: str
+) -> AsyncIterator[tuple[int, dict | None]]:
+    """
+    Parse an NDJSON or CSV body line by line, yielding the line number and
+    the record, or None if the line could not be parsed.
+
+    CSV bodies must start with a header row and may not contain quoted line
+    breaks.
+    """
+    header = None
+    lineno = 0
+    async for line in iter_lines(stream, settings.USER_IMPORT_MAX_LINE_BYTES):
+        lineno += 1
+        if line is None:
+            yield lineno, None
+            continue
+        if not line.strip():
+            continue
+
+        if media_type == "text/csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = values
+                continue
+            if len(values) != len(header):
+                yield lineno, None
+                continue
+            # Empty CSV cells mean the column is not set
+            yield lineno, {k: v for k, v in zip(header, values) if v != ""}
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield lineno, record if isinstance(record, dict) else None
+
+
+async def import_batch(
+    batch: list[tuple[int, UserImport]], users_crud: UsersCRUD, seen: set[str]
+) -> list[dict]:
+    """
+    Insert a batch of users, reporting the ones whose email is in ``seen``,
+    the emails of the previous batches, or earlier in the batch as
+    duplicates. Adds the emails of the batch to ``seen``.
+    """
+    report = []
+    unique: dict[str, tuple[int, UserImport]] = {}
+    for lineno, user in batch:
+        if user.email in unique or user.email in seen:
+            report.append({"line": lineno, "email": user.email, "status": "duplicate"})
+        else:
+            unique[user.email] = (lineno, user)
+    seen.update(unique)
+
+    to_hash = [user for _, user in unique.values() if user.password is not None]
+    hashes = await password_hasher.hash_many([user.password for user in to_hash])
+    for user, hashed in zip(to_hash, hashes):
+        user.password_hash = hashed
+
+    created = await users_crud.bulk_create(
+        [
+            {
+                "email": user.email,
+                "password": user.password_hash,
+                "is_active": user.is_active,
+                "is_admin": user.is_admin,
+            }
+            for _, user in unique.values()
+        ]
+    )
+    for email, (lineno, _) in unique.items():
+        status = "created" if email in created else "exists"
+        report.append({"line": lineno, "email": email, "status": status})
+
+    return sorted(report, key=lambda row: row["line"])
+
+
+async def import_users(
+    stream: AsyncIterator[bytes], media_type: str, users_crud: UsersCRUD
+) -> AsyncIterator[str]:
+    """
+    Import users from an NDJSON or CSV body and stream back one NDJSON report
+    line per input row, followed by a summary line.
+
+    Rows are validated and inserted in batches of USER_IMPORT_BATCH_SIZE, so
+    memory use only grows with the set of emails kept to report duplicates
+    across batches.
+    Emails that already exist are reported and left untouched. Invalid rows
+    are reported as soon as they are parsed, the others once their batch is
+    written, so report lines may come out of input order.
+    """
+    summary = {"created": 0, "exists": 0, "duplicate": 0, "invalid": 0}
+    batch: list[tuple[int, UserImport]] = []
+    seen: set[str] = set()
+
+    def emit(rows: list[dict]) -> str:
+        for row in rows:
+            summary[row["status"]] += 1
+        return "".join(json.dumps(row) + "\n" for row in rows)
+
+    async for lineno, record in iter_records(stream, media_type):
+        if record is None:
+            detail = "Malformed row"
+        else:
+            try:
+                batch.append((lineno, UserImport.model_validate(record)))
+                detail = None
+            except ValidationError as e:
+                detail = "; ".join(error["msg"] for error in e.errors())
+        if detail is not None:
+            yield emit([{"line": lineno, "status": "invalid", "detail": detail}])
+            continue
+
+        if len(batch) >= settings.USER_IMPORT_BATCH_SIZE:
+            yield emit(await import_batch(batch, users_crud, seen))
+            batch = []
+
+    if batch:
+        yield emit(await import_batch(batch, users_crud, seen))
+    yield json.dumps({"summary": summary}) + "\n"
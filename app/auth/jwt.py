@@ -1,37 +1,174 @@
-from datetime import datetime, timedelta
+import functools
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Annotated, Literal
-from uuid import UUID
+from uuid import UUID, uuid4
 
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from fastapi import BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from loguru import logger
 
-from app.auth.crud.user import UsersCrudDep
+from app.auth.cache import principal_cache, token_versions
+from app.auth.codec import JWTError, KeyRing, create_codec
+from app.auth.crud.token import RevokedTokensCRUD
+from app.auth.crud.user import UsersCRUD, UsersCrudDep
 from app.auth.models.jwt import Token, TokenData
-from app.auth.models.user import UserRead
-from app.auth.security import verify_password
-from app.core.config import settings
+from app.auth.models.user import Principal, User
+from app.auth.security import password_hasher, password_needs_update
+from app.core.cache import TTLCache
+from app.core.config import JWTKeyConfig, settings
+from app.core.ratelimit import MemoryRateLimitBackend, RateLimiter
 
-ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
+decoded_tokens: TTLCache[bytes, dict] = TTLCache(
+    maxsize=settings.JWT_DECODE_CACHE_MAX_SIZE,
+    ttl=settings.JWT_DECODE_CACHE_TTL_SECS,
+)
+rate_limit_backend = MemoryRateLimitBackend(
+    shards=settings.RATE_LIMIT_SHARDS, max_keys=settings.RATE_LIMIT_MAX_KEYS
+)
+login_ip_limiter = RateLimiter(
+    rate_limit_backend,
+    limit=settings.LOGIN_RATE_LIMIT_PER_IP,
+    window=settings.LOGIN_RATE_LIMIT_WINDOW_SECS,
+)
+login_email_limiter = RateLimiter(
+    rate_limit_backend,
+    limit=settings.LOGIN_RATE_LIMIT_PER_EMAIL,
+    window=settings.LOGIN_RATE_LIMIT_WINDOW_SECS,
+)
 
 
-async def authenticate_user(email: str, password: str, *, users_crud: UsersCrudDep):
+@functools.lru_cache(maxsize=1)
+def _load_keyring(
+    algorithm: str,
+    secret_key: str | None,
+    private_key: str | None,
+    key_id: str | None,
+    verification_keys: tuple[JWTKeyConfig, ...],
+) -> KeyRing:
+    signing_key = create_codec(
+        algorithm, secret_key if algorithm == "HS256" else private_key, kid=key_id
+    )
+    return KeyRing(
+        signing_key,
+        [create_codec(key.alg, key.key, kid=key.kid) for key in verification_keys],
+    )
+
+
+def get_keyring() -> KeyRing:
+    """
+    Return the keys of the current settings, parsed once and reused until the
+    settings change.
+    """
+    return _load_keyring(
+        settings.JWT_ALGORITHM,
+        settings.JWT_SECRET_KEY,
+        settings.JWT_PRIVATE_KEY,
+        settings.JWT_KEY_ID,
+        tuple(settings.JWT_VERIFICATION_KEYS),
+    )
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verify a JWT and return its claims, memoizing the result until the token
+    expires.
+
+    The cache key covers the key ring as well, so rotating keys never returns
+    payloads verified with a key that was removed.
+
+    Raises:
+        JWTError: If the token is invalid or has expired.
+    """
+    keyring = get_keyring()
+    key = hashlib.sha256(f"{keyring.id}:{token}".encode()).digest()
+    payload = decoded_tokens.get(key)
+    if payload is None:
+        payload = keyring.decode(token)
+        exp = payload.get("exp")
+        ttl = None if exp is None else exp - time.time()
+        decoded_tokens.set(key, payload, ttl=ttl)
+    return dict(payload)
+
+
+def login_email_key(email: str) -> str:
+    return f"login:email:{email.strip().lower()}"
+
+
+async def check_login_rate_limit(
+    request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+):
+    """
+    Throttle login attempts per client IP and failed ones per email, before
+    any database lookup or password hashing is done for them. Only failures
+    count against an email, so nobody can lock its owner out by guessing it.
+
+    Raises:
+        HTTPException: 429 with a Retry-After header when a limit is reached.
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = await login_ip_limiter.hit(f"login:ip:{client_ip}")
+    if not retry_after:
+        retry_after = await login_email_limiter.check(
+            login_email_key(form_data.username)
+        )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+async def authenticate_user(
+    email: str,
+    password: str,
+    *,
+    users_crud: UsersCrudDep,
+    background_tasks: BackgroundTasks | None = None,
+):
     user = await users_crud.get(email=email)
-    if not user or not verify_password(password, user.password):
+    if not user or not await password_hasher.verify(password, user.password):
+        await login_email_limiter.hit(login_email_key(email))
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if (
+        background_tasks is not None
+        and settings.PASSWORD_REHASH_ON_LOGIN
+        and password_needs_update(user.password)
+    ):
+        # Hashed after the response is sent, the login doesn't wait for it
+        background_tasks.add_task(
+            rehash_password, user.id, password, user.password, users_crud=users_crud
+        )
     return user
 
 
+async def rehash_password(
+    user_id: UUID, password: str, old_hash: str, *, users_crud: UsersCRUD
+):
+    """
+    Upgrade an outdated password hash to the current policy.
+    """
+    try:
+        new_hash = await password_hasher.hash(password)
+        if await users_crud.update_password_hash(user_id, old_hash, new_hash):
+            logger.info(f"Upgraded the password hash of user {user_id}")
+    except Exception:
+        # Retried on the next login
+        logger.exception(f"Upgrading the password hash of user {user_id} failed")
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)], *, users_crud: UsersCrudDep
-):
+) -> Principal:
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
 
         if user_id is None:
@@ -47,6 +184,15 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if settings.JWT_STATELESS_AUTH:
+        principal = get_principal_from_claims(TokenData(**payload))
+        if principal is not None:
+            return principal
+
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
     user = await users_crud.get(id=user_id)
     if user is None:
         raise HTTPException(
@@ -54,10 +200,39 @@ async def get_current_user(
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
+    principal = Principal.model_validate(user)
+    principal_cache.set(user_id, principal)
+    return principal
+
 
+def get_principal_from_claims(payload: TokenData) -> Principal | None:
+    """
+    Build the principal from the role claims of a verified access token.
 
-async def get_admin_user(user: Annotated[UserRead, Depends(get_current_user)]):
+    Returns None for tokens issued without claims, which have to be looked up
+    in the database instead.
+    """
+    if payload.typ != "access" or not payload.has_claims:
+        return None
+
+    min_version = token_versions.get(str(payload.sub))
+    if min_version is not None and payload.ver < min_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return Principal.model_construct(
+        id=payload.sub,
+        email=payload.email,
+        is_admin=payload.adm,
+        is_active=payload.act,
+        token_version=payload.ver,
+    )
+
+
+async def get_admin_user(user: Annotated[Principal, Depends(get_current_user)]):
     if not user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -71,21 +246,39 @@ def create_jwt_token(
     user_id: str | UUID,
     tkn_type: Literal["access", "refresh"],
     expires_delta: timedelta,
+    user: User | None = None,
+    *,
+    jti: UUID | None = None,
+    version: int | None = None,
 ):
     expire = datetime.utcnow() + expires_delta
-    to_encode = TokenData(sub=user_id, exp=expire, typ=tkn_type)
-    encoded_jwt = jwt.encode(
-        to_encode.model_dump(),
-        settings.JWT_SECRET_KEY,
-        algorithm=ALGORITHM,
-    )
-    return encoded_jwt
+    to_encode = TokenData(sub=user_id, exp=expire, typ=tkn_type, jti=jti, ver=version)
+    if user is not None:
+        to_encode.email = user.email
+        to_encode.adm = user.is_admin
+        to_encode.act = user.is_active
+        to_encode.ver = user.token_version
+
+    return get_keyring().encode(to_encode.model_dump(exclude_none=True))
+
+
+def warm_up_jwt():
+    """
+    Parse the keys and run the signer and verifier once ahead of the first
+    request.
+    """
+    token = create_jwt_token(uuid4(), "access", timedelta(minutes=1))
+    get_keyring().decode(token)
 
 
 def validate_refresh_token(token: str):
-    payload = TokenData(
-        **jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[ALGORITHM])
-    )
+    try:
+        payload = TokenData(**decode_token(token))
+    except JWTError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=e.args[0],
+        )
     if payload.typ != "refresh":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -99,16 +292,67 @@ def validate_refresh_token(token: str):
     return payload
 
 
-def create_token_set(user_id: str | UUID) -> Token:
+def create_token_set(user_id: str | UUID, *, user: User | None = None) -> Token:
+    """
+    Issue an access and refresh token pair for a user.
+
+    In stateless mode the role claims and token version of ``user`` are
+    embedded into both tokens. Refresh tokens always get a unique ``jti`` for
+    rotation, and the token version of ``user`` when given.
+    """
+    claims_user = user if settings.JWT_STATELESS_AUTH else None
     return Token(
         access_token=create_jwt_token(
             user_id=user_id,
             tkn_type="access",
             expires_delta=timedelta(seconds=settings.JWT_ACCESS_TOKEN_EXPIRE_SECS),
+            user=claims_user,
         ),
         refresh_token=create_jwt_token(
             user_id=user_id,
             tkn_type="refresh",
-            expires_delta=timedelta(seconds=settings.JWT_ACCESS_TOKEN_EXPIRE_SECS),
+            expires_delta=timedelta(seconds=settings.JWT_REFRESH_TOKEN_EXPIRE_SECS),
+            user=claims_user,
+            jti=uuid4(),
+            version=None if user is None else user.token_version,
         ),
     )
+
+
+async def rotate_refresh_token(
+    payload: TokenData, *, users_crud: UsersCRUD, tokens_crud: RevokedTokensCRUD
+) -> Token:
+    """
+    Revoke a validated refresh token and issue a new token set in its place.
+
+    A refresh token can only be used once; presenting one that was already
+    rotated means it leaked, so every token of its user is revoked. Revoking
+    the token detects the reuse in the same statement, no check is needed
+    beforehand.
+
+    Raises:
+        HTTPException: If the token was revoked or already used.
+    """
+    user = await users_crud.get(id=payload.sub, primary=True)
+    if payload.ver is not None and payload.ver != user.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+        )
+
+    if payload.jti is not None:
+        expires_at = payload.exp.astimezone(timezone.utc).replace(tzinfo=None)
+        # Also fails when another worker rotated the same token concurrently
+        if not await tokens_crud.revoke(payload.jti, user.id, expires_at):
+            await reject_reused_refresh_token(payload, users_crud=users_crud)
+
+    return create_token_set(user.id, user=user)
+
+
+async def reject_reused_refresh_token(payload: TokenData, *, users_crud: UsersCRUD):
+    logger.warning(f"Refresh token {payload.jti} of user {payload.sub} was reused")
+    await users_crud.revoke_all_tokens(payload.sub)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token has been revoked",
+    )
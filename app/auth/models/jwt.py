@@ -1,3 +1,4 @@
+import calendar
 from datetime import datetime, timedelta
 from typing import Literal
 from uuid import UUID
@@ -18,18 +19,34 @@ class TokenData(BaseModel):
     exp: datetime = Field(
         default_factory=lambda: datetime.utcnow() + timedelta(minutes=15)
     )
+    # Claims only embedded in stateless mode
+    email: str | None = None
+    adm: bool | None = None
+    act: bool | None = None
+    ver: int | None = None
+    # Unique id of refresh tokens, for rotation and revocation
+    jti: UUID | None = None
 
     @property
     def is_expired(self) -> bool:
         return datetime.utcnow() >= self.exp.replace(tzinfo=None)
 
+    @property
+    def has_claims(self) -> bool:
+        return None not in (self.email, self.adm, self.act, self.ver)
+
     @property
     def time_to_expire(self) -> timedelta:
         return self.exp.replace(tzinfo=None) - datetime.utcnow()
 
-    @field_serializer("sub")
-    def serialize_sub(self, sub: UUID):
-        return str(sub)
+    @field_serializer("iat", "exp")
+    def serialize_numeric_date(self, value: datetime):
+        # Seconds since the epoch, naive datetimes are UTC
+        return calendar.timegm(value.utctimetuple())
+
+    @field_serializer("sub", "jti")
+    def serialize_uuid(self, value: UUID | None):
+        return None if value is None else str(value)
 
 
 class RefreshTokenReq(BaseModel):
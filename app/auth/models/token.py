@@ -0,0 +1,30 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import Column, ForeignKey, Uuid
+from sqlmodel import Field
+
+from app.core.models import CreateAtModel
+
+prefix = "auth"
+
+
+class RevokedToken(CreateAtModel, table=True):
+    """
+    Refresh token that was rotated or revoked, by its ``jti`` claim.
+    """
+
+    __tablename__ = f"{prefix}_revoked_token"
+
+    jti: UUID = Field(primary_key=True, nullable=False)
+    # Hard deleting a user drops its revoked tokens as well
+    user_id: UUID = Field(
+        sa_column=Column(
+            Uuid,
+            ForeignKey(f"{prefix}_user.id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
+        )
+    )
+    # Rows are only needed until the token expires
+    expires_at: datetime = Field(nullable=False, index=True)
@@ -1,13 +1,15 @@
-import re
+from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from pydantic import EmailStr, field_serializer, field_validator, model_validator
+from pydantic import EmailStr, model_validator
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
-from app.auth.security import get_password_hash
-from app.core.models import DetailResp, TimestampModel, UUIDModel
+from app.auth.security import is_password_hash
+from app.core.conditional import make_etag
+from app.core.models import DetailResp, SoftDeleteModel, TimestampModel, UUIDModel
 
 prefix = "auth"
 
@@ -16,22 +18,46 @@ class UserBase(SQLModel):
     email: str = Field(nullable=False, unique=True, index=True)
 
 
-class User(UUIDModel, TimestampModel, UserBase, table=True):
+class User(UUIDModel, TimestampModel, SoftDeleteModel, UserBase, table=True):
     __tablename__ = f"{prefix}_user"
-
+    __table_args__ = (
+        # Emails only have to be unique among users that aren't deleted
+        Index(
+            f"ix_{prefix}_user_email_not_deleted",
+            "email",
+            unique=True,
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        # Keyset pagination of the admin user listing
+        Index(
+            f"ix_{prefix}_user_created_at_id_not_deleted",
+            "created_at",
+            "id",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        # Lets the purge job find deleted users without scanning live ones
+        Index(
+            f"ix_{prefix}_user_deleted_at_deleted",
+            "deleted_at",
+            postgresql_where=text("is_deleted"),
+        ),
+    )
+
+    email: str = Field(nullable=False)
     password: str = Field(nullable=False)
     is_admin: bool = Field(default=False, nullable=False)
     is_active: bool = Field(default=False, nullable=False)
+    token_version: int = Field(
+        default=0,
+        nullable=False,
+        sa_column_kwargs={"server_default": text("0")},
+    )
 
 
 class UserCreate(UserBase):
     password: str
     email: EmailStr
 
-    @field_validator("password")
-    def hash_password(cls, v: str) -> str:
-        return get_password_hash(v)
-
     model_config = {
         "json_schema_extra": {
             "example": {
@@ -42,6 +68,22 @@ class UserCreate(UserBase):
     }
 
 
+class UserImport(UserBase):
+    email: EmailStr
+    password: Optional[str] = None
+    password_hash: Optional[str] = None
+    is_active: bool = False
+    is_admin: bool = False
+
+    @model_validator(mode="after")
+    def check_password(self):
+        if (self.password is None) == (self.password_hash is None):
+            raise ValueError("Exactly one of password, password_hash must be provided")
+        if self.password_hash is not None and not is_password_hash(self.password_hash):
+            raise ValueError("Unsupported password_hash format")
+        return self
+
+
 class UserRead(UserBase):
     id: UUID
     email: EmailStr
@@ -60,6 +102,22 @@ class UserRead(UserBase):
     }
 
 
+class Principal(UserRead):
+    """
+    The authenticated user, with the fields versioning it. They aren't part
+    of responses, and are None for principals built from token claims.
+    """
+
+    updated_at: Optional[datetime] = Field(default=None, exclude=True)
+    token_version: Optional[int] = Field(default=None, exclude=True)
+
+    @property
+    def etag(self) -> str:
+        # updated_at only has second precision, every update also bumps
+        # token_version
+        return make_etag(self.id, self.token_version, self.updated_at)
+
+
 class UserPatch(UserBase):
     user_id: Optional[UUID] = None
     password: Optional[str] = None
@@ -67,13 +125,6 @@ class UserPatch(UserBase):
     is_active: Optional[bool] = None
     is_admin: Optional[bool] = None
 
-    @field_serializer("password", check_fields=False)
-    def hash_password(self, v: str):
-        ptn = re.compile(r"^\$2[ayb]\$.{56}$")
-        if not re.match(ptn, v):
-            return get_password_hash(v)
-        return v
-
     @model_validator(mode="after")
     def check_if_at_least_one(self):
         if not (self.password or self.is_active or self.is_admin):
@@ -98,3 +149,8 @@ class UserPatch(UserBase):
 
 class UserDetailResp(DetailResp):
     user: UserRead
+
+
+class UserPage(SQLModel):
+    items: list[UserRead]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,155 @@
+import asyncio
+from datetime import timedelta
+
+from loguru import logger
+from sqlalchemy import Column, ColumnElement, and_, delete, func, select
+from sqlalchemy.ext.asyncio.session import async_sessionmaker
+
+from app.auth.crud.token import utc_now
+from app.auth.models.token import RevokedToken
+from app.auth.models.user import User
+from app.core.config import settings
+from app.core.db import async_session
+
+
+async def delete_in_batches(
+    session_factory: async_sessionmaker,
+    column: Column,
+    whereclause: ColumnElement[bool],
+    *,
+    batch_size: int,
+    pause: float,
+) -> int:
+    """
+    Delete the rows matching ``whereclause`` by their primary key ``column``.
+
+    Rows are removed in short transactions of at most ``batch_size`` rows with
+    a pause in between, so the job never holds many row locks at once and
+    autovacuum can keep up. Rows locked by other transactions are skipped
+    until the next run.
+
+    Returns:
+        int: The number of rows removed.
+    """
+    batch = (
+        select(column)
+        .where(whereclause)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        delete(column.table)
+        .where(column.in_(batch.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
+    total = 0
+    while True:
+        async with session_factory() as session:
+            result = await session.execute(stmt)
+            await session.commit()
+
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+        await asyncio.sleep(pause)
+
+
+async def purge_deleted_users(
+    session_factory: async_sessionmaker,
+    *,
+    batch_size: int,
+    pause: float,
+    retention: timedelta,
+) -> int:
+    """
+    Hard delete users that were soft deleted more than ``retention`` ago, in
+    batches (see ``delete_in_batches``).
+
+    Returns:
+        int: The number of users removed.
+    """
+    # Same clock as UsersCRUD.delete sets deleted_at with
+    cutoff = func.localtimestamp() - retention
+    return await delete_in_batches(
+        session_factory,
+        User.id,
+        and_(User.is_deleted, User.deleted_at < cutoff),
+        batch_size=batch_size,
+        pause=pause,
+    )
+
+
+async def purge_expired_tokens(
+    session_factory: async_sessionmaker, *, batch_size: int, pause: float
+) -> int:
+    """
+    Delete the revoked refresh tokens that expired, in batches. Every refresh
+    adds one of them.
+
+    Returns:
+        int: The number of tokens removed.
+    """
+    return await delete_in_batches(
+        session_factory,
+        RevokedToken.jti,
+        RevokedToken.expires_at <= utc_now(),
+        batch_size=batch_size,
+        pause=pause,
+    )
+
+
+class UserPurger:
+    """
+    Background task running ``purge_deleted_users`` and
+    ``purge_expired_tokens`` every ``interval`` seconds.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run(self):
+        while True:
+            try:
+                purged = await purge_deleted_users(
+                    async_session,
+                    batch_size=settings.USER_PURGE_BATCH_SIZE,
+                    pause=settings.USER_PURGE_PAUSE_SECS,
+                    retention=timedelta(seconds=settings.USER_PURGE_RETENTION_SECS),
+                )
+                if purged:
+                    logger.info(f"Purged {purged} deleted users")
+                purged = await purge_expired_tokens(
+                    async_session,
+                    batch_size=settings.USER_PURGE_BATCH_SIZE,
+                    pause=settings.USER_PURGE_PAUSE_SECS,
+                )
+                if purged:
+                    logger.info(f"Purged {purged} expired revoked tokens")
+            except Exception:
+                logger.exception("Purging deleted users failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+user_purger = UserPurger(interval=settings.USER_PURGE_INTERVAL_SECS)
+
+
+if __name__ == "__main__":
+    purged = asyncio.run(
+        purge_deleted_users(
+            async_session,
+            batch_size=settings.USER_PURGE_BATCH_SIZE,
+            pause=settings.USER_PURGE_PAUSE_SECS,
+            retention=timedelta(seconds=settings.USER_PURGE_RETENTION_SECS),
+        )
+    )
+    print(f"Purged {purged} deleted users")
@@ -1,11 +1,251 @@
-from passlib.context import CryptContext
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import password_hash_duration
+
+# bcrypt hash of "warm-up" with the lowest cost, only ever used to load the
+# bcrypt backend
+WARM_UP_HASH = "$2b$04$pTidrth0f6wDMTCuiKbmTOGPuxVUzu65i.NUTQyy5S9aQvyLAdXaa"
+
+
+def create_pwd_context(
+    scheme: str = "bcrypt",
+    bcrypt_rounds: int = 12,
+    argon2_time_cost: int = 3,
+    argon2_memory_cost: int = 65536,
+    argon2_parallelism: int = 4,
+):
+    """
+    Return a context hashing with ``scheme`` at the given cost that verifies
+    both bcrypt and argon2 hashes. Hashes of the other scheme or of a lower
+    cost are reported as needing an update.
+    """
+    # Imported on first use, passlib isn't needed to start the app
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt", "argon2"],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+@functools.cache
+def get_pwd_context():
+    return create_pwd_context(
+        scheme=settings.PASSWORD_HASH_SCHEME,
+        bcrypt_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        argon2_time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+        argon2_memory_cost=settings.PASSWORD_ARGON2_MEMORY_KIB,
+        argon2_parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+    )
 
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+def get_password_hashes(passwords: list[str]) -> list[str]:
+    pwd_context = get_pwd_context()
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def is_password_hash(value: str) -> bool:
+    return get_pwd_context().identify(value) is not None
+
+
+def password_needs_update(hashed_password: str) -> bool:
+    """
+    Tell whether a hash was made with another scheme or a lower cost than the
+    current policy. Only parses the hash, it's cheap enough for the event loop.
+    """
+    return get_pwd_context().needs_update(hashed_password)
+
+
+def get_hash_worker_count() -> int:
+    """
+    Hash processes of this server worker. By default every server worker
+    gets its share of the CPUs, one pool per CPU each would start CPU²
+    processes competing for the same cores.
+    """
+    if settings.PASSWORD_HASH_WORKERS:
+        return settings.PASSWORD_HASH_WORKERS
+    return max(1, (os.cpu_count() or 1) // (settings.SERVER_WORKERS or 1))
+
+
+def _warm_up():
+    # Loads passlib and the bcrypt backend in a pool worker
+    verify_password("warm-up", WARM_UP_HASH)
+
+
+def _timed(func, *args):
+    """
+    Run ``func`` in a pool worker and also return how long it took there,
+    without the time spent queueing for the worker.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class PasswordHasher:
+    """
+    Run bcrypt hashing and verification in a bounded process pool so the
+    event loop is never blocked for the duration of a hash.
+
+    At most ``workers + queue_size`` jobs are accepted at a time, anything
+    beyond that is rejected immediately instead of piling up behind the pool.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        queue_size: int = 64,
+        timeout: float = 10.0,
+        bulk_chunk_size: int = 8,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.bulk_chunk_size = bulk_chunk_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+        # Bulk jobs waiting for a slot, woken whenever one is released
+        self._waiters: list[asyncio.Future] = []
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(
+            "verify", verify_password, plain_password, hashed_password
+        )
+
+    @property
+    def bulk_workers(self) -> int:
+        # One worker always stays free of bulk jobs for logins
+        return max(1, self.workers - 1)
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """
+        Hash a batch of passwords in chunks of ``bulk_chunk_size``, at most
+        ``bulk_workers`` chunks at a time so logins keep a worker of their
+        own. Chunks wait for a free slot instead of being rejected when the
+        pool is full.
+        """
+        chunks = [
+            passwords[i : i + self.bulk_chunk_size]
+            for i in range(0, len(passwords), self.bulk_chunk_size)
+        ]
+        results: list[list[str]] = [[] for _ in chunks]
+        queue = iter(enumerate(chunks))
+
+        async def hash_chunks():
+            for index, chunk in queue:
+                await self._wait_for_slot()
+                results[index] = await self._run(
+                    "hash_bulk", get_password_hashes, chunk
+                )
+
+        await asyncio.gather(
+            *(hash_chunks() for _ in range(min(self.bulk_workers, len(chunks))))
+        )
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def _wait_for_slot(self):
+        while self._pending >= self.capacity:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    async def warm_up(self):
+        """
+        Start every worker process and load the bcrypt backend in each of them,
+        and in this process.
+        """
+        get_pwd_context().identify(WARM_UP_HASH)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self.executor, _warm_up)
+                for _ in range(self.workers)
+            )
+        )
+
+    async def _run(self, operation: str, func, *args):
+        if self._pending >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent password operations",
+                headers={"Retry-After": "1"},
+            )
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, _timed, func, *args)
+        # The slot is only released once the worker is done with the job, a
+        # job whose caller timed out still occupies the pool
+        self._pending += 1
+        future.add_done_callback(self._release)
+        try:
+            result, elapsed = await asyncio.wait_for(
+                asyncio.shield(future), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password operation timed out",
+                headers={"Retry-After": "1"},
+            )
+        password_hash_duration.observe(elapsed, operation)
+        return result
+
+    def _release(self, future: asyncio.Future):
+        self._pending -= 1
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        if not future.cancelled():
+            # Retrieved, the caller may have stopped waiting for it
+            future.exception()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=get_hash_worker_count(),
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECS,
+    bulk_chunk_size=settings.PASSWORD_HASH_BULK_CHUNK_SIZE,
+)
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from enum import IntEnum
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.drain import RequestTracker, request_tracker
+from app.core.metrics import http_requests_shed
+
+
+class Priority(IntEnum):
+    # Health checks and metrics, never shed
+    CRITICAL = 0
+    # Cheap authenticated reads
+    HIGH = 1
+    NORMAL = 2
+    # Password hashing and other expensive calls
+    LOW = 3
+
+
+# Pressure, as a fraction of the thresholds, from which each priority is shed
+SHED_AT = {
+    Priority.HIGH: 1.5,
+    Priority.NORMAL: 1.0,
+    Priority.LOW: 0.75,
+}
+
+
+class DecayingMax:
+    """
+    Follow increases of a signal at once and let it decay by half every
+    ``half_life`` seconds, so a single spike sheds load briefly and load
+    that's no longer admitted can't keep the signal up.
+    """
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self._value = 0.0
+        self._updated = time.monotonic()
+
+    def get(self) -> float:
+        elapsed = time.monotonic() - self._updated
+        return self._value * 0.5 ** (elapsed / self.half_life)
+
+    def observe(self, value: float):
+        self._value = max(self.get(), value)
+        self._updated = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Decide which requests this worker admits from its event loop lag, the
+    time requests wait for a pooled connection and its in-flight requests.
+
+    Each signal is compared with its threshold (0 disables it) and the
+    highest ratio is the pressure. Requests are shed when the pressure
+    reaches SHED_AT of their priority, expensive ones first.
+    """
+
+    def __init__(
+        self,
+        max_loop_lag: float,
+        max_pool_wait: float,
+        max_in_flight: int,
+        lag_interval: float = 0.1,
+        half_life: float = 1.0,
+        tracker: RequestTracker = request_tracker,
+    ):
+        self.max_loop_lag = max_loop_lag
+        self.max_pool_wait = max_pool_wait
+        self.max_in_flight = max_in_flight
+        self.lag_interval = lag_interval
+        self.tracker = tracker
+        self.loop_lag = DecayingMax(half_life)
+        self.pool_wait = DecayingMax(half_life)
+        self._task: asyncio.Task | None = None
+
+    def observe_pool_wait(self, elapsed: float):
+        self.pool_wait.observe(elapsed)
+
+    @property
+    def pressure(self) -> float:
+        ratios = [0.0]
+        if self.max_loop_lag > 0:
+            ratios.append(self.loop_lag.get() / self.max_loop_lag)
+        if self.max_pool_wait > 0:
+            ratios.append(self.pool_wait.get() / self.max_pool_wait)
+        if self.max_in_flight > 0:
+            ratios.append(self.tracker.in_flight / self.max_in_flight)
+        return max(ratios)
+
+    def admit(self, priority: Priority) -> bool:
+        if priority == Priority.CRITICAL:
+            return True
+        return self.pressure < SHED_AT[priority]
+
+    def stats(self) -> dict:
+        pressure = self.pressure
+        return {
+            "shedding": [
+                priority.name.lower()
+                for priority, shed_at in SHED_AT.items()
+                if pressure >= shed_at
+            ],
+            "pressure": round(pressure, 3),
+            "loop_lag_ms": round(self.loop_lag.get() * 1000, 3),
+            "pool_wait_ms": round(self.pool_wait.get() * 1000, 3),
+            "in_flight": self.tracker.in_flight,
+        }
+
+    async def run(self):
+        """
+        Measure the event loop lag: how much later than asked a sleep wakes up.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self.loop_lag.observe(max(loop.time() - start - self.lag_interval, 0.0))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+admission_controller = AdmissionController(
+    max_loop_lag=settings.ADMISSION_MAX_LOOP_LAG_SECS,
+    max_pool_wait=settings.ADMISSION_MAX_POOL_WAIT_SECS,
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    lag_interval=settings.ADMISSION_LAG_INTERVAL_SECS,
+    half_life=settings.ADMISSION_HALF_LIFE_SECS,
+)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware answering 503 with Retry-After to the requests the
+    controller doesn't admit, before any of their work is done.
+
+    Requests matching ``critical_paths`` are never shed, and the ones in
+    ``low_priority`` as (method, path) pairs are shed first. Other GET and
+    HEAD requests with an Authorization header are assumed to be cheap reads
+    of high priority. The header is not validated here, so any client can
+    lift its reads to HIGH; expensive reads belong in ``low_priority``.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController = admission_controller,
+        critical_paths: frozenset[str] = frozenset(),
+        low_priority: frozenset[tuple[str, str]] = frozenset(),
+    ):
+        self.app = app
+        self.controller = controller
+        self.critical_paths = critical_paths
+        self.low_priority = low_priority
+
+    def classify(self, scope: Scope) -> Priority:
+        method, path = scope["method"], scope["path"]
+        if path in self.critical_paths:
+            return Priority.CRITICAL
+        if (method, path) in self.low_priority:
+            return Priority.LOW
+        if method in ("GET", "HEAD") and any(
+            name == b"authorization" for name, _ in scope["headers"]
+        ):
+            return Priority.HIGH
+        return Priority.NORMAL
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.ADMISSION_CONTROL_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        priority = self.classify(scope)
+        if not self.controller.admit(priority):
+            http_requests_shed.inc(priority.name.lower())
+            response = JSONResponse(
+                {"detail": "Server is overloaded"},
+                status_code=503,
+                headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,74 @@
+import hashlib
+from typing import Any, Callable
+
+from fastapi import Depends, Request, status
+from starlette.responses import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Weak entity tag of a resource version, e.g. its id and update time.
+    """
+    digest = hashlib.blake2b(
+        "\0".join(str(part) for part in parts).encode(), digest_size=16
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque_tag(etag: str) -> str:
+    # If-None-Match compares weakly, W/"x" matches "x"
+    return etag.strip().removeprefix("W/")
+
+
+class ConditionalGet:
+    """
+    Answer GET requests whose If-None-Match holds the current ETag of the
+    resource with 304 Not Modified, before its response is even built.
+    """
+
+    def __init__(self, request: Request, cache_control: str, vary: str | None):
+        self.method = request.method
+        self.if_none_match = request.headers.get("if-none-match")
+        self.headers = {"Cache-Control": cache_control}
+        if vary:
+            self.headers["Vary"] = vary
+
+    def is_fresh(self, etag: str) -> bool:
+        """
+        Tell whether the client already holds the version tagged ``etag``.
+        """
+        if self.if_none_match is None or self.method not in ("GET", "HEAD"):
+            return False
+        if self.if_none_match.strip() == "*":
+            return True
+        tag = _opaque_tag(etag)
+        return any(_opaque_tag(item) == tag for item in self.if_none_match.split(","))
+
+    def respond(self, etag: str, build: Callable[[], Response]) -> Response:
+        """
+        Return 304 if the client's copy is fresh, the response of ``build``
+        otherwise, both with the ETag and caching headers.
+        """
+        if self.is_fresh(etag):
+            response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = build()
+        response.headers.update({**self.headers, "ETag": etag})
+        return response
+
+
+def conditional_get(
+    cache_control: str = "private, no-cache", vary: str | None = "Authorization"
+):
+    """
+    Dependency providing a ConditionalGet, e.g.
+    ``conditional: Annotated[ConditionalGet, conditional_get()]``.
+
+    The defaults fit resources of the authenticated user: only the client may
+    store them, and it must revalidate them on every use.
+    """
+
+    def dependency(request: Request) -> ConditionalGet:
+        return ConditionalGet(request, cache_control=cache_control, vary=vary)
+
+    return Depends(dependency)
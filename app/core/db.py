@@ -1,17 +1,269 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+import asyncio
+import itertools
+import time
+from dataclasses import asdict, dataclass
+from typing import Annotated
+
+from fastapi import Depends
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.ext.asyncio.session import async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.admission import admission_controller
 from app.core.config import settings
+from app.core.metrics import db_pool_wait_duration, instrument_engine
+from app.core.querystats import instrument_queries
+
+
+@dataclass
+class PoolWaitStats:
+    count: int = 0
+    total_secs: float = 0.0
+    max_secs: float = 0.0
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.total_secs += elapsed
+        self.max_secs = max(self.max_secs, elapsed)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waits for a connection,
+    including the time spent opening a new one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.wait_stats.record(elapsed)
+            db_pool_wait_duration.observe(elapsed)
+            admission_controller.observe_pool_wait(elapsed)
+
+
+def create_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            # SQLAlchemy's prepared statement cache and asyncpg's own one
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+    instrument_queries(engine.sync_engine)
+    if settings.METRICS_ENABLED:
+        instrument_engine(engine.sync_engine)
+    return engine
+
+
+_engine: AsyncEngine | None = None
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Return the engine of the primary, creating it on first use. Creating it
+    imports the asyncpg dialect, which is among the slowest imports of the app.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.DB_CONN_STR.unicode_string())
+    return _engine
+
+
+class LazyAsyncSessionMaker(async_sessionmaker):
+    """
+    Session factory bound to the primary engine once the first session is made.
+    """
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+async_session = LazyAsyncSessionMaker(expire_on_commit=False)
+
+# Replication delay in seconds, 0 when the replica has replayed everything it
+# received and on servers that are not in recovery at all
+REPLICA_LAG_QUERY = text(
+    "SELECT COALESCE("
+    "CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)"
+)
+# Errors after which a replica is taken out of rotation until its next check
+REPLICA_ERRORS = (InterfaceError, OperationalError, OSError)
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.engine = create_engine(url)
+        self.session_factory = async_sessionmaker(
+            bind=self.engine, expire_on_commit=False
+        )
+        self.healthy = True
+        self.lag_secs = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
 
-async_engine = create_async_engine(
-    settings.DB_CONN_STR.unicode_string(),
-    echo=settings.is_debug,
-    future=True,
+
+class ReplicaRouter:
+    """
+    Pick read replicas round-robin, skipping the ones that failed their last
+    health check or lag further behind the primary than ``max_lag``.
+    """
+
+    def __init__(self, urls: list[str], max_lag: float, check_interval: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._counter = itertools.count()
+        self._task: asyncio.Task | None = None
+
+    def pick(self) -> Replica | None:
+        available = [
+            replica
+            for replica in self.replicas
+            if replica.healthy and replica.lag_secs <= self.max_lag
+        ]
+        if not available:
+            return None
+        return available[next(self._counter) % len(available)]
+
+    def mark_unhealthy(self, replica: Replica):
+        if replica.healthy:
+            logger.warning(f"Replica {replica.name} is unavailable")
+        replica.healthy = False
+
+    async def probe(self, replica: Replica):
+        async with replica.engine.connect() as conn:
+            replica.lag_secs = float(await conn.scalar(REPLICA_LAG_QUERY))
+
+    async def check(self, replica: Replica):
+        try:
+            # A replica that hangs is as unavailable as one that's down
+            await asyncio.wait_for(self.probe(replica), timeout=self.check_interval)
+        except (*REPLICA_ERRORS, asyncio.TimeoutError):
+            self.mark_unhealthy(replica)
+        else:
+            replica.healthy = True
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.gather(
+                    *(self.check(replica) for replica in self.replicas)
+                )
+            except Exception:
+                logger.exception("Replica health check failed")
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+replica_router = ReplicaRouter(
+    urls=settings.DB_REPLICA_URLS,
+    max_lag=settings.DB_REPLICA_MAX_LAG_SECS,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL_SECS,
 )
 
 
 async def get_async_session() -> AsyncSession:
-    async_session = async_sessionmaker(bind=async_engine, expire_on_commit=False)
     async with async_session() as session:
         yield session
+
+
+async def get_async_read_session(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> AsyncSession:
+    """
+    Yield a session on a read replica, or the primary session when no
+    replica is available. Replica sessions carry their ``Replica`` in
+    ``session.info["replica"]``.
+    """
+    replica = replica_router.pick()
+    if replica is None:
+        yield session
+        return
+
+    async with replica.session_factory() as read_session:
+        read_session.info["replica"] = replica
+        yield read_session
+
+
+async def warm_up_pool(connections: int):
+    """
+    Open ``connections`` pooled connections to the primary and run a probe
+    query on each, so the first requests don't pay for the handshakes.
+    """
+    if connections <= 0:
+        return
+
+    engine = get_engine()
+
+    async def probe():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    start = time.perf_counter()
+    # All at once, so the pool can't hand back the same connection
+    results = await asyncio.gather(
+        *(probe() for _ in range(connections)), return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        logger.warning(f"Warming up the connection pool failed: {errors[0]!r}")
+        return
+    logger.info(
+        f"Opened {connections} database connections in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+
+
+async def dispose_engine():
+    await replica_router.stop()
+    if _engine is not None:
+        await _engine.dispose()
+
+
+def get_pool_stats() -> dict:
+    """
+    Return a snapshot of the connection pool usage of this worker.
+    """
+    pool: InstrumentedQueuePool = get_engine().pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "wait": asdict(pool.wait_stats),
+    }
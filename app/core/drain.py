@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from loguru import logger
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class RequestTracker:
+    """
+    Count the HTTP requests in flight in this worker so shutdown can wait for
+    them, and refuse new ones once draining started.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def enter(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def exit(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Stop accepting requests and wait up to ``timeout`` seconds for the
+        ones in flight to finish.
+
+        Returns:
+            bool: True if every request finished in time.
+        """
+        self.draining = True
+        if self.in_flight:
+            logger.info(f"Draining {self.in_flight} in-flight requests")
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"{self.in_flight} requests still in flight after {timeout}s"
+            )
+            return False
+        logger.info(f"Drained in {time.monotonic() - start:.2f}s")
+        return True
+
+
+request_tracker = RequestTracker()
+
+
+class DrainMiddleware:
+    """
+    ASGI middleware tracking in-flight requests, including streamed bodies
+    and background tasks, and answering 503 while the worker shuts down.
+    """
+
+    def __init__(self, app: ASGIApp, tracker: RequestTracker = request_tracker):
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.tracker.draining:
+            response = JSONResponse(
+                {"detail": "Server is shutting down"},
+                status_code=503,
+                headers={"Retry-After": "1", "Connection": "close"},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.tracker.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.tracker.exit()
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+C = TypeVar("C")
+
+
+class BatchLoader(Generic[K, V, C]):
+    """
+    Single-flight loader in the style of DataLoader.
+
+    Concurrent loads of the same key share one pending result, and the keys
+    requested within one iteration of the event loop are fetched together by
+    one call of ``batch_load(keys, context)``. The first caller of a batch
+    runs that call in its own task with its own context (e.g. the session),
+    so the batch never outlives the caller whose context it uses. If it fails
+    or the first caller is cancelled, that caller gets the error and every
+    other caller loads its key again with its own context.
+
+    Results are shared between callers, ``batch_load`` should return values
+    that are safe to share or copy them per caller in ``load``.
+    """
+
+    def __init__(
+        self,
+        batch_load: Callable[[list[K], C], Awaitable[dict[K, V]]],
+        max_batch_size: int = 100,
+    ):
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        # Queued or in flight
+        self._pending: dict[K, asyncio.Future] = {}
+        # Still open to the keys of other callers
+        self._batch: dict[K, asyncio.Future] = {}
+
+    async def load(self, key: K, context: C) -> V | None:
+        """
+        Return the value of ``key``, None if ``batch_load`` didn't find it.
+        """
+        future = self._pending.get(key)
+        if future is None:
+            batch = self._batch
+            leader = not batch
+            future = self._enqueue(key)
+            if leader:
+                values = await self._run(batch, context)
+                return values.get(key)
+
+        try:
+            # Shielded, a cancelled follower must not cancel the shared result
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+        except Exception:
+            pass
+        result = await self.batch_load([key], context)
+        return result.get(key)
+
+    def _enqueue(self, key: K) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._batch[key] = self._pending[key] = future
+        if len(self._batch) >= self.max_batch_size:
+            # Full, the next key starts a batch of its own
+            self._batch = {}
+        return future
+
+    async def _run(self, batch: dict[K, asyncio.Future], context: C) -> dict[K, V]:
+        try:
+            # The tasks that are ready in this iteration add their keys meanwhile
+            await asyncio.sleep(0)
+            if batch is self._batch:
+                self._batch = {}
+            values = await self.batch_load(list(batch), context)
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+                # Marked as retrieved, nobody may be awaiting it anymore
+                future.exception()
+            raise
+        else:
+            for key, future in batch.items():
+                future.set_result(values.get(key))
+            return values
+        finally:
+            if batch is self._batch:
+                self._batch = {}
+            for key, future in batch.items():
+                if not future.done():
+                    # The first caller was cancelled
+                    future.cancel()
+                self._pending.pop(key, None)
@@ -0,0 +1,278 @@
+import bisect
+import time
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Upper bounds in seconds, from sub-millisecond queries to slow password hashes
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = (
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    type: str
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]: ...
+
+    def render(self) -> str:
+        header = (
+            f"# HELP {self.name} {self.documentation}\n"
+            f"# TYPE {self.name} {self.type}\n"
+        )
+        return header + "".join(f"{sample}\n" for sample in self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, tuple(labelnames))
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def set_total(self, value: float, *labels: str):
+        """
+        Copy a count kept elsewhere, e.g. by a cache, when scraping.
+        """
+        self._values[labels] = value
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in list(self._values.items()):
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}{label_str} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed buckets. Observations only bump one bucket counter,
+    the cumulative counts Prometheus expects are computed when rendering.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, tuple(labelnames))
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._values.get(labels)
+        if counts is None:
+            counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def count(self, *labels: str) -> int:
+        counts = self._values.get(labels)
+        return 0 if counts is None else int(sum(counts[:-1]))
+
+    def samples(self) -> Iterator[str]:
+        bucket_names = self.labelnames + ("le",)
+        bounds = self.buckets + (float("inf"),)
+        for labels, counts in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                label_str = _format_labels(
+                    bucket_names, labels + (_format_value(bound),)
+                )
+                yield f"{self.name}_bucket{label_str} {cumulative}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{label_str} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Metrics of this worker process.
+
+    Updates are plain dict and list operations done from the event loop, so
+    they need no locks and cost well under a microsecond each.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Return every metric in the Prometheus text exposition format.
+        """
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests_total",
+    "HTTP requests by route template, method and status code.",
+    ("method", "route", "status"),
+)
+http_requests_shed = registry.counter(
+    "http_requests_shed_total",
+    "HTTP requests rejected by admission control, by priority.",
+    ("priority",),
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving an HTTP request until its response was sent.",
+    ("method", "route"),
+)
+db_statement_duration = registry.histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing SQL statements, by statement type.",
+    ("operation",),
+)
+db_pool_wait_duration = registry.histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a connection from the pool.",
+)
+db_pool_connections = registry.gauge(
+    "db_pool_connections",
+    "Connections of the primary pool by state.",
+    ("state",),
+)
+cache_entries = registry.gauge(
+    "cache_entries",
+    "Entries held by in-process caches.",
+    ("cache",),
+)
+cache_lookups = registry.counter(
+    "cache_lookups_total",
+    "Lookups of in-process caches by result.",
+    ("cache", "result"),
+)
+password_hash_duration = registry.histogram(
+    "password_hash_duration_seconds",
+    "Time spent hashing or verifying a password in a worker process.",
+    ("operation",),
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them per route template,
+    so that e.g. every /users/{target_user_id} request shares one series.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path_format", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(
+                time.perf_counter() - start, method, route_path
+            )
+            http_requests.inc(method, route_path, str(status_code))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, failed statements leave nothing behind
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+    db_statement_duration.observe(elapsed, operation)
+
+
+def instrument_engine(engine: Engine):
+    """
+    Time every statement executed by the given (sync) engine.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -22,12 +22,15 @@ class UUIDModel(SQLModel):
 
 
 class SoftDeleteModel(SQLModel):
+    # Not indexed on its own, tables index their live rows with partial indexes
+    # (WHERE NOT is_deleted) instead
     is_deleted: bool = Field(
         default=False,
         nullable=False,
-        index=True,
         sa_column_kwargs={"server_default": text("false")},
     )
+    # Set with is_deleted, the retention of deleted rows counts from it
+    deleted_at: datetime | None = Field(default=None, nullable=True)
 
 
 class CreateAtModel(SQLModel):
@@ -0,0 +1,47 @@
+"""
+Precompute the OpenAPI schema of the app.
+
+Usage:
+    python -m app.core.openapi [--output openapi.json]
+
+Point OPENAPI_SCHEMA_PATH at the file to serve it as is, the schema must be
+regenerated whenever the API changes.
+"""
+
+import argparse
+import json
+
+from fastapi import FastAPI
+from loguru import logger
+
+
+def load_openapi_schema(app: FastAPI, path: str):
+    """
+    Serve the schema stored at ``path`` instead of generating it on the first
+    request for it.
+    """
+    try:
+        with open(path) as f:
+            app.openapi_schema = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"OpenAPI schema {path} not found, generating it on demand")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--output", default="openapi.json")
+    args = parser.parse_args()
+
+    from app.main import app
+
+    # Always generated from the routes, never from a previous file
+    app.openapi_schema = None
+    with open(args.output, "w") as f:
+        json.dump(app.openapi(), f, separators=(",", ":"))
+    print(f"OpenAPI schema saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_secs: float = 0.0
+    # Executions per SQL string, repeated ones hint at N+1 queries
+    statements: Counter[str] = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_secs += elapsed
+        self.statements[statement] += 1
+
+    def merge(self, other: "QueryStats"):
+        self.count += other.count
+        self.total_secs += other.total_secs
+        self.statements.update(other.statements)
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        """
+        Return the statements executed at least ``threshold`` times.
+        """
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= threshold
+        }
+
+
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Count the statements executed within the block, including tasks started
+    from it. Nested blocks also add their statements to the enclosing one.
+    """
+    parent = query_stats.get()
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats.reset(token)
+        if parent is not None:
+            parent.merge(stats)
+
+
+def describe_parameters(parameters: Any) -> str:
+    """
+    Describe the shape of bound parameters, their names and types but never
+    their values, which may hold passwords or personal data.
+    """
+    if isinstance(parameters, dict):
+        types = (f"{key}: {type(value).__name__}" for key, value in parameters.items())
+        return "{" + ", ".join(types) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany
+            return f"{len(parameters)} x {describe_parameters(parameters[0])}"
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_stats_start
+    stats = query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if 0 < settings.DB_SLOW_QUERY_SECS <= elapsed:
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f}ms): {statement} "
+            f"parameters: {describe_parameters(parameters)}"
+        )
+
+
+def instrument_queries(engine: Engine):
+    """
+    Count the statements of the given (sync) engine per tracked block and log
+    the slow ones.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware tracking the statements of each request. In debug
+    environments the count and DB time are sent as X-DB-Queries and
+    Server-Timing headers; statements repeated DB_N_PLUS_ONE_THRESHOLD times
+    within a request are logged as likely N+1 queries.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start" and settings.is_debug:
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Queries"] = str(stats.count)
+                    headers.append(
+                        "Server-Timing", f"db;dur={stats.total_secs * 1000:.2f}"
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        threshold = settings.DB_N_PLUS_ONE_THRESHOLD
+        if threshold > 0:
+            for statement, count in stats.repeated(threshold).items():
+                logger.warning(
+                    f"Possible N+1 query, executed {count} times by "
+                    f"{scope['method']} {scope['path']}: {statement}"
+                )
@@ -0,0 +1,162 @@
+import math
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage of the rate limit counters. The in-memory backend keeps them per
+    worker; a shared backend (e.g. Redis) can implement the same interface to
+    enforce the limits across workers.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """
+        Count a hit for ``key`` unless it already reached ``limit`` hits in
+        the last ``window`` seconds.
+
+        Returns:
+            float: 0 if the hit was counted, otherwise the seconds to wait
+            before the next hit is allowed.
+        """
+
+    @abstractmethod
+    async def check(self, key: str, limit: int, window: float) -> float:
+        """
+        Tell whether a hit for ``key`` would be allowed, without counting it.
+
+        Returns:
+            float: 0 if it would be, otherwise the seconds to wait.
+        """
+
+    @abstractmethod
+    async def reset(self, key: str | None = None):
+        """
+        Forget the hits of ``key``, or of every key.
+        """
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Sliding window counters kept in ``shards`` LRU dicts of at most
+    ``max_keys`` keys in total.
+
+    Each key only stores the hit counts of the current and the previous fixed
+    window; the count over the sliding window is estimated by weighting the
+    previous one by how much of it still overlaps. Updates are O(1) and the
+    least recently hit keys are evicted once a shard is full.
+    """
+
+    def __init__(self, shards: int, max_keys: int):
+        self.max_keys_per_shard = max(max_keys // shards, 1)
+        # key -> (start of the current window, current count, previous count)
+        self._shards: list[OrderedDict[str, tuple[float, int, int]]] = [
+            OrderedDict() for _ in range(shards)
+        ]
+
+    def _shard(self, key: str) -> OrderedDict[str, tuple[float, int, int]]:
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    def _counts(self, key: str, window: float) -> tuple[float, int, int, float]:
+        """
+        Return the start of the current window of ``key``, its count, the
+        count of the previous window and the time elapsed in the current one.
+        """
+        now = time.monotonic()
+        start, current, previous = self._shard(key).get(key, (now, 0, 0))
+
+        # Roll the fixed windows forward
+        elapsed_windows = int((now - start) // window)
+        if elapsed_windows:
+            previous = current if elapsed_windows == 1 else 0
+            current = 0
+            start += elapsed_windows * window
+        return start, current, previous, now - start
+
+    async def check(self, key: str, limit: int, window: float) -> float:
+        _, current, previous, elapsed = self._counts(key, window)
+        estimate = previous * (1 - elapsed / window) + current
+        if estimate >= limit:
+            return _retry_after(current, previous, elapsed, window, limit)
+        return 0
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        shard = self._shard(key)
+        start, current, previous, elapsed = self._counts(key, window)
+        estimate = previous * (1 - elapsed / window) + current
+        if estimate >= limit:
+            shard.move_to_end(key)
+            return _retry_after(current, previous, elapsed, window, limit)
+
+        shard[key] = (start, current + 1, previous)
+        shard.move_to_end(key)
+        if len(shard) > self.max_keys_per_shard:
+            shard.popitem(last=False)
+        return 0
+
+    async def reset(self, key: str | None = None):
+        if key is None:
+            for shard in self._shards:
+                shard.clear()
+        else:
+            self._shard(key).pop(key, None)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+def _retry_after(
+    current: int, previous: int, elapsed: float, window: float, limit: int
+) -> float:
+    """
+    Time until the weighted count of a full key drops below ``limit``.
+    """
+    if current < limit:
+        # The previous window's weight decays enough within the current one
+        wait = window * (1 - (limit - current) / previous) - elapsed
+    else:
+        # Only once the current window became the previous one
+        wait = window - elapsed + window * (1 - limit / current)
+    # 0 would mean the hit was allowed
+    return max(wait, 1e-3)
+
+
+class RateLimiter:
+    """
+    Allow at most ``limit`` hits per key within any ``window`` seconds.
+    """
+
+    def __init__(self, backend: RateLimitBackend, limit: int, window: float):
+        self.backend = backend
+        self.limit = limit
+        self.window = window
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0 and self.window > 0
+
+    async def hit(self, key: str) -> int:
+        """
+        Count a hit for ``key``.
+
+        Returns:
+            int: 0 if the hit is allowed, otherwise the whole seconds to wait,
+            suitable for a Retry-After header.
+        """
+        if not self.enabled:
+            return 0
+        retry_after = await self.backend.hit(key, self.limit, self.window)
+        return math.ceil(retry_after) if retry_after > 0 else 0
+
+    async def check(self, key: str) -> int:
+        """
+        Like ``hit``, without counting a hit, for limits that only count
+        some of the requests they apply to.
+        """
+        if not self.enabled:
+            return 0
+        retry_after = await self.backend.check(key, self.limit, self.window)
+        return math.ceil(retry_after) if retry_after > 0 else 0
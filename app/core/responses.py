@@ -0,0 +1,17 @@
+from typing import Any
+
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+
+class ModelJSONResponse(JSONResponse):
+    """
+    JSON response rendered by pydantic-core.
+
+    Pydantic models, UUIDs and datetimes are serialized natively, so endpoints
+    can return ``ModelJSONResponse(model)`` and skip FastAPI's response model
+    validation and ``jsonable_encoder`` pass over data that is already valid.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
@@ -1,18 +1,125 @@
-import uvicorn
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import PlainTextResponse, Response
+
+from app.auth.cache import collect_metrics as collect_cache_metrics
+from app.auth.jwt import get_keyring, warm_up_jwt
+from app.auth.purge import user_purger
+from app.auth.security import password_hasher
+from app.core.admission import AdmissionMiddleware, admission_controller
 from app.core.config import settings
+from app.core.db import (
+    dispose_engine,
+    get_pool_stats,
+    replica_router,
+    warm_up_pool,
+)
+from app.core.drain import DrainMiddleware
+from app.core.metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    db_pool_connections,
+    registry,
+)
+from app.core.openapi import load_openapi_schema
+from app.core.querystats import QueryStatsMiddleware
+from app.core.responses import ModelJSONResponse
 from app.router import auth_router
 
-app = FastAPI(title=settings.PROJECT_NAME, debug=settings.is_debug)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_size = settings.DB_POOL_WARMUP_SIZE
+    await warm_up_pool(settings.DB_POOL_SIZE if warmup_size is None else warmup_size)
+    await password_hasher.warm_up()
+    warm_up_jwt()
+    admission_controller.start()
+    replica_router.start()
+    if settings.USER_PURGE_ENABLED:
+        user_purger.start()
+    yield
+    await admission_controller.stop()
+    await user_purger.stop()
+    password_hasher.shutdown()
+    await dispose_engine()
+
+
+app = FastAPI(
+    title=settings.PROJECT_NAME,
+    debug=settings.is_debug,
+    lifespan=lifespan,
+    default_response_class=ModelJSONResponse,
+    openapi_url="/openapi.json" if settings.openapi_enabled else None,
+)
+if settings.openapi_enabled and settings.OPENAPI_SCHEMA_PATH:
+    load_openapi_schema(app, settings.OPENAPI_SCHEMA_PATH)
+app.add_middleware(
+    AdmissionMiddleware,
+    critical_paths=frozenset({"/", "/metrics", "/status/db"}),
+    # Password hashing and full table dumps
+    low_priority=frozenset(
+        {
+            ("POST", "/api/v1/auth/token"),
+            ("POST", "/api/v1/auth/users"),
+            ("POST", "/api/v1/auth/users/import"),
+            ("GET", "/api/v1/auth/users/export"),
+        }
+    ),
+)
+app.add_middleware(DrainMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/", tags=["status"], include_in_schema=False)
 async def health_check():
-    return {"status": "ok"}
+    # Still healthy while shedding, the worker keeps serving what it admits
+    admission = admission_controller.stats()
+    return {
+        "status": "shedding" if admission["shedding"] else "ok",
+        "admission": admission,
+    }
+
+
+@app.get("/status/db", tags=["status"], include_in_schema=False)
+async def db_status():
+    return {"pool": get_pool_stats()}
+
+
+@app.get("/metrics", tags=["status"], include_in_schema=False)
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    pool = get_pool_stats()
+    for state in ("checked_in", "checked_out", "overflow"):
+        db_pool_connections.set(pool[state], state)
+    collect_cache_metrics()
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/.well-known/jwks.json", tags=["auth"], include_in_schema=False)
+async def jwks():
+    # Other services verify tokens with these keys and refetch them when they
+    # see an unknown kid, so they can be cached for long
+    return Response(
+        get_keyring().jwks,
+        media_type="application/json",
+        headers={"Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECS}"},
+    )
 
 
 app.include_router(auth_router, prefix="/api/v1")
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", port=8080, host="0.0.0.0", reload=True)
+    import uvicorn
+
+    # Development server, production uses `python -m app.server`
+    uvicorn.run(
+        "app.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        reload=True,
+    )
@@ -0,0 +1,276 @@
+"""
+Production server: a supervisor process running uvicorn workers.
+
+Usage:
+    python -m app.server
+
+Workers either accept from one socket bound by the supervisor, or with
+SERVER_REUSE_PORT each bind their own SO_REUSEPORT socket so the kernel
+spreads connections evenly between them. Crashed workers are restarted and
+workers that served their SERVER_MAX_REQUESTS are replaced.
+
+Each worker has its own database pools and password hashing processes. The
+hashing processes default to the worker's share of the CPUs, while the
+database sees SERVER_WORKERS times the connections of one worker.
+
+Signals:
+    SIGHUP: replace the workers one by one, each once its successor is ready.
+    SIGINT, SIGTERM: stop the workers gracefully and exit.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from multiprocessing.context import SpawnProcess
+from multiprocessing.synchronize import Event
+
+import uvicorn
+from loguru import logger
+from uvicorn.config import STARTUP_FAILURE
+
+from app.core.config import settings
+from app.core.drain import RequestTracker, request_tracker
+
+APP = "app.main:app"
+spawn = multiprocessing.get_context("spawn")
+# Left to uvicorn to close the connections once drained, requests still
+# running by then are cancelled
+CLOSE_TIMEOUT_SECS = 1.0
+
+
+def get_worker_count() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def get_max_requests() -> int | None:
+    """
+    Requests a new worker serves before it's replaced, jittered so workers
+    started together aren't recycled at the same time.
+    """
+    if settings.SERVER_MAX_REQUESTS <= 0:
+        return None
+    return settings.SERVER_MAX_REQUESTS + random.randint(
+        0, settings.SERVER_MAX_REQUESTS_JITTER
+    )
+
+
+def bind_socket(reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in settings.SERVER_HOST else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((settings.SERVER_HOST, settings.SERVER_PORT))
+    sock.listen(settings.SERVER_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+class WorkerServer(uvicorn.Server):
+    """
+    uvicorn server draining its in-flight requests before it shuts down.
+
+    uvicorn closes the listening sockets and waits for open connections
+    before the lifespan shutdown runs, too late to drain from there. Once
+    told to exit, the worker keeps serving and answers 503 to new requests
+    until the ones in flight finished, then lets uvicorn shut down.
+    """
+
+    def __init__(
+        self, config: uvicorn.Config, tracker: RequestTracker = request_tracker
+    ):
+        super().__init__(config)
+        self.tracker = tracker
+        self._drain: asyncio.Task | None = None
+
+    async def on_tick(self, counter: int) -> bool:
+        if not await super().on_tick(counter):
+            return False
+        if self.force_exit:
+            return True
+        if self._drain is None:
+            self._drain = asyncio.create_task(
+                self.tracker.drain(timeout=settings.SHUTDOWN_DRAIN_TIMEOUT_SECS)
+            )
+        return self._drain.done()
+
+
+def run_worker(sock: socket.socket | None, max_requests: int | None, ready: Event):
+    """
+    Entry point of a worker process.
+    """
+    if sock is None:
+        sock = bind_socket(reuse_port=True)
+    config = uvicorn.Config(
+        APP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECS,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        limit_max_requests=max_requests,
+        timeout_graceful_shutdown=CLOSE_TIMEOUT_SECS,
+        proxy_headers=True,
+    )
+    server = WorkerServer(config)
+
+    def notify_ready():
+        while not server.started and not server.should_exit:
+            time.sleep(0.05)
+        if server.started:
+            ready.set()
+
+    threading.Thread(target=notify_ready, daemon=True).start()
+    server.run(sockets=[sock])
+
+
+class Worker:
+    def __init__(self, sock: socket.socket | None):
+        self.ready = spawn.Event()
+        self.process: SpawnProcess = spawn.Process(
+            target=run_worker,
+            args=(sock, get_max_requests(), self.ready),
+            daemon=False,
+        )
+
+    def start(self):
+        self.process.start()
+
+    def wait_ready(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.ready.wait(0.1):
+                return True
+            if not self.process.is_alive():
+                return False
+        return False
+
+    def terminate(self):
+        if self.process.is_alive():
+            os.kill(self.process.pid, signal.SIGTERM)
+
+    def join(self, timeout: float):
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning(f"Killing worker [{self.process.pid}]")
+            self.process.kill()
+            self.process.join()
+
+
+class Supervisor:
+    """
+    Keep ``workers`` uvicorn worker processes running.
+    """
+
+    def __init__(self, workers: int, reuse_port: bool):
+        self.workers_num = workers
+        self.reuse_port = reuse_port
+        # Without SO_REUSEPORT every worker accepts from this socket
+        self.sock = None if reuse_port else bind_socket(reuse_port=False)
+        self.workers: list[Worker] = []
+        self.should_exit = threading.Event()
+        self.signals: list[int] = []
+
+    @property
+    def ready_timeout(self) -> float:
+        return settings.SHUTDOWN_DRAIN_TIMEOUT_SECS + 30
+
+    def spawn_worker(self) -> Worker:
+        worker = Worker(self.sock)
+        worker.start()
+        logger.info(f"Started worker [{worker.process.pid}]")
+        return worker
+
+    def run(self):
+        for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            signal.signal(sig, lambda sig, frame: self.signals.append(sig))
+
+        logger.info(
+            f"Supervisor [{os.getpid()}] serving on "
+            f"{settings.SERVER_HOST}:{settings.SERVER_PORT} "
+            f"with {self.workers_num} workers"
+        )
+        self.workers = [self.spawn_worker() for _ in range(self.workers_num)]
+        while not self.should_exit.wait(0.5):
+            self.handle_signals()
+            self.replace_exited_workers()
+        self.stop()
+
+    def handle_signals(self):
+        while self.signals:
+            sig = self.signals.pop(0)
+            if sig == signal.SIGHUP:
+                self.reload()
+            else:
+                self.should_exit.set()
+                return
+
+    def replace_exited_workers(self):
+        for i, worker in enumerate(self.workers):
+            exitcode = worker.process.exitcode
+            if exitcode is None:
+                continue
+
+            worker.process.join()
+            if exitcode == STARTUP_FAILURE:
+                # The next worker would fail the same way
+                logger.error(f"Worker [{worker.process.pid}] failed to start")
+                self.should_exit.set()
+                return
+            if exitcode == 0:
+                logger.info(f"Worker [{worker.process.pid}] is being recycled")
+            else:
+                logger.warning(f"Worker [{worker.process.pid}] died ({exitcode})")
+            self.workers[i] = self.spawn_worker()
+
+    def reload(self):
+        """
+        Replace every worker, starting each replacement and waiting until it
+        serves before stopping the worker it replaces.
+        """
+        logger.info("Reloading workers")
+        for i, old in enumerate(self.workers):
+            new = self.spawn_worker()
+            if not new.wait_ready(self.ready_timeout):
+                logger.error(
+                    f"Worker [{new.process.pid}] didn't start, aborting the reload"
+                )
+                new.terminate()
+                new.join(timeout=self.ready_timeout)
+                return
+            old.terminate()
+            old.join(timeout=self.ready_timeout)
+            self.workers[i] = new
+            if self.signals:
+                # Stopping takes precedence over finishing the reload
+                return
+
+    def stop(self):
+        logger.info("Stopping workers")
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.join(timeout=settings.SHUTDOWN_DRAIN_TIMEOUT_SECS + 5)
+        if self.sock is not None:
+            self.sock.close()
+
+
+def main():
+    reuse_port = settings.SERVER_REUSE_PORT
+    if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+        logger.warning("SO_REUSEPORT is not supported, sharing one socket instead")
+        reuse_port = False
+    workers = get_worker_count()
+    # Inherited by the spawned workers, which size their pools by it
+    os.environ["SERVER_WORKERS"] = str(workers)
+    Supervisor(workers=workers, reuse_port=reuse_port).run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
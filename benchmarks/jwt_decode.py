@@ -0,0 +1,45 @@
+"""
+Compare the verification cost of a token with the cold and warm cost of
+app.auth.jwt.decode_token, for the configured JWT_ALGORITHM.
+
+Usage:
+    python -m benchmarks.jwt_decode [--number 20000]
+"""
+
+import argparse
+import timeit
+import uuid
+from datetime import timedelta
+
+from app.auth.jwt import create_jwt_token, decode_token, decoded_tokens, get_keyring
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    token = create_jwt_token(
+        user_id=uuid.uuid4(),
+        tkn_type="access",
+        expires_delta=timedelta(minutes=5),
+    )
+
+    def cold():
+        decoded_tokens.clear()
+        decode_token(token)
+
+    def warm():
+        decode_token(token)
+
+    def verify():
+        get_keyring().decode(token)
+
+    decode_token(token)
+    for name, func in (("verify", verify), ("cold", cold), ("warm", warm)):
+        elapsed = timeit.timeit(func, number=args.number)
+        print(f"{name:>6}: {elapsed / args.number * 1e6:8.2f} us/decode")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Load and latency benchmark of the auth endpoints.
+
+Seeds users into the configured database, drives register, login,
+/users/me, refresh, patch and delete at the given concurrency and reports
+throughput and latency percentiles per endpoint. Results are saved as JSON
+and can be compared against a saved baseline.
+
+The app runs in-process through the ASGI transport unless --url points to
+a live server, e.g. one started with
+``LOGIN_RATE_LIMIT_PER_IP=0 LOGIN_RATE_LIMIT_PER_EMAIL=0 uvicorn app.main:app``.
+Both use the database of the current settings for seeding.
+
+Usage:
+    python -m benchmarks.load run [--url URL] [--concurrency 16] [--requests 500]
+        [--output results.json]
+    python -m benchmarks.load compare baseline.json results.json [--threshold 0.1]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from httpx import AsyncClient, Response
+from sqlalchemy import delete, insert
+
+from app.auth.jwt import create_token_set
+from app.auth.models.jwt import Token
+from app.auth.models.user import User
+from app.auth.security import get_password_hash, password_hasher
+from app.core.config import settings
+from app.core.db import async_session, dispose_engine
+
+API = "/api/v1/auth"
+PASSWORD = "benchpass"
+# Latency and throughput fields compared against the baseline, and whether
+# higher values are better
+COMPARED_FIELDS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+}
+
+
+@dataclass
+class Dataset:
+    prefix: str
+    admin_id: uuid.UUID
+    user_ids: list[uuid.UUID] = field(default_factory=list)
+
+    def email(self, suffix: str | int) -> str:
+        return f"{self.prefix}-{suffix}@example.com"
+
+
+async def seed(users: int) -> Dataset:
+    """
+    Insert an admin and ``users`` regular users sharing one password hash.
+    """
+    dataset = Dataset(prefix=f"bench-{uuid.uuid4().hex[:8]}", admin_id=uuid.uuid4())
+    password = get_password_hash(PASSWORD)
+    rows = [
+        {
+            "id": dataset.admin_id,
+            "email": dataset.email("admin"),
+            "password": password,
+            "is_admin": True,
+        }
+    ]
+    for i in range(users):
+        user_id = uuid.uuid4()
+        dataset.user_ids.append(user_id)
+        rows.append({"id": user_id, "email": dataset.email(i), "password": password})
+
+    async with async_session() as session:
+        for i in range(0, len(rows), settings.USER_IMPORT_BATCH_SIZE):
+            batch = rows[i : i + settings.USER_IMPORT_BATCH_SIZE]
+            await session.execute(insert(User.__table__).values(batch))
+        await session.commit()
+    return dataset
+
+
+async def cleanup(dataset: Dataset):
+    async with async_session() as session:
+        await session.execute(
+            delete(User).where(User.email.startswith(f"{dataset.prefix}-"))
+        )
+        await session.commit()
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def drive(
+    send: Callable[[int], Awaitable[Response]],
+    requests: int,
+    concurrency: int,
+    expected_status: int,
+) -> dict:
+    """
+    Call ``send`` with indices 0..requests-1 from ``concurrency`` workers and
+    summarize the latencies of the calls that returned ``expected_status``.
+    """
+    indices = iter(range(requests))
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in indices:
+            start = time.perf_counter()
+            response = await send(i)
+            elapsed = time.perf_counter() - start
+            if response.status_code == expected_status:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_scenarios(
+    client: AsyncClient, dataset: Dataset, requests: int, concurrency: int
+) -> dict[str, dict]:
+    admin_token = create_token_set(dataset.admin_id).access_token
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    tokens = [create_token_set(user_id) for user_id in dataset.user_ids]
+    cycle = itertools.cycle(range(len(dataset.user_ids)))
+
+    def user_headers(i: int) -> dict:
+        return {"Authorization": f"Bearer {tokens[i].access_token}"}
+
+    async def register(i: int) -> Response:
+        data = {"email": dataset.email(f"new-{i}"), "password": PASSWORD}
+        return await client.post(f"{API}/users", json=data)
+
+    async def login(i: int) -> Response:
+        data = {"username": dataset.email(next(cycle)), "password": PASSWORD}
+        return await client.post(f"{API}/token", data=data)
+
+    async def me(i: int) -> Response:
+        return await client.get(f"{API}/users/me", headers=user_headers(next(cycle)))
+
+    async def refresh(i: int) -> Response:
+        user = next(cycle)
+        response = await client.put(
+            f"{API}/token",
+            json={"refresh_token": tokens[user].refresh_token},
+            headers=user_headers(user),
+        )
+        # Refresh tokens are single use, reusing one revokes the user's tokens
+        if response.status_code == 200:
+            tokens[user] = Token(**response.json())
+        return response
+
+    async def patch(i: int) -> Response:
+        # The admin patches other users, so its own token stays valid
+        data = {"user_id": str(dataset.user_ids[next(cycle)]), "is_active": True}
+        return await client.patch(f"{API}/users", json=data, headers=admin_headers)
+
+    async def delete_user(i: int) -> Response:
+        # Runs last, every request deletes a different user
+        user_id = dataset.user_ids[i]
+        return await client.delete(f"{API}/users/{user_id}", headers=admin_headers)
+
+    scenarios = {
+        "register": (register, 201),
+        "login": (login, 200),
+        "me": (me, 200),
+        "refresh": (refresh, 200),
+        "patch": (patch, 200),
+        "delete": (delete_user, 200),
+    }
+    results = {}
+    for name, (send, expected_status) in scenarios.items():
+        results[name] = await drive(send, requests, concurrency, expected_status)
+        print_result(name, results[name])
+    return results
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name:>9}: {result['throughput_rps']:9.1f} req/s"
+        f"  p50 {result['p50_ms']:8.2f} ms"
+        f"  p95 {result['p95_ms']:8.2f} ms"
+        f"  p99 {result['p99_ms']:8.2f} ms"
+        f"  errors {result['errors']}",
+        file=sys.stderr,
+    )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # Deleting and patching needs one seeded user per request
+    dataset = await seed(max(args.users, args.requests))
+    try:
+        if args.url:
+            client = AsyncClient(base_url=args.url, timeout=60)
+        else:
+            from app.auth.jwt import login_email_limiter, login_ip_limiter
+            from app.main import app
+
+            # Every request comes from the same client and a handful of users
+            login_ip_limiter.limit = login_email_limiter.limit = 0
+            client = AsyncClient(app=app, base_url="http://benchmark", timeout=60)
+        async with client:
+            results = await run_scenarios(
+                client, dataset, args.requests, args.concurrency
+            )
+    finally:
+        await cleanup(dataset)
+        password_hasher.shutdown()
+        await dispose_engine()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "target": args.url or "asgi",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "users": len(dataset.user_ids),
+            "python": platform.python_version(),
+            "db_pool_size": settings.DB_POOL_SIZE,
+            "password_hash_workers": settings.PASSWORD_HASH_WORKERS,
+            "stateless_auth": settings.JWT_STATELESS_AUTH,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """
+    Return a description of every compared field of an endpoint that got
+    worse than the baseline by more than ``threshold`` (a fraction).
+    """
+    regressions = []
+    for endpoint, base in baseline["results"].items():
+        result = current["results"].get(endpoint)
+        if result is None:
+            continue
+        for name, higher_is_better in COMPARED_FIELDS.items():
+            before, after = base[name], result[name]
+            if not before:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            marker = "REGRESSION" if worse > threshold else ""
+            print(
+                f"{endpoint:>9} {name:>14}: {before:10.2f} -> {after:10.2f}"
+                f" ({change:+7.1%}) {marker}",
+                file=sys.stderr,
+            )
+            if marker:
+                regressions.append(f"{endpoint} {name} {change:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmark")
+    run_parser.add_argument("--url", help="Base URL of a live server")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--requests", type=int, default=500)
+    run_parser.add_argument("--users", type=int, default=1000)
+    run_parser.add_argument("--output", default="benchmark.json")
+
+    compare_parser = commands.add_parser("compare", help="Compare two results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Allowed relative slowdown before flagging a regression",
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        report = asyncio.run(run(args))
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}", file=sys.stderr)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regressions", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
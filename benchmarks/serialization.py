@@ -0,0 +1,83 @@
+"""
+Compare the per-request serialization cost of the /users/me and /token
+responses through FastAPI's default pipeline (response model validation,
+jsonable_encoder and JSONResponse) and through ModelJSONResponse.
+
+Usage:
+    python -m benchmarks.serialization [--number 20000]
+"""
+
+import argparse
+import timeit
+import uuid
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app.auth.jwt import create_token_set
+from app.auth.models.user import UserRead
+from app.core.responses import ModelJSONResponse
+from app.main import app
+
+
+def get_route(path: str, method: str) -> APIRoute:
+    for route in app.routes:
+        if (
+            isinstance(route, APIRoute)
+            and route.path == path
+            and method in route.methods
+        ):
+            return route
+    raise LookupError(f"{method} {path} is not a route")
+
+
+def run_sync(coro):
+    # serialize_response never awaits for async endpoints, so drive it
+    # directly without paying for an event loop iteration
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("serialize_response suspended")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    user = UserRead(
+        id=uuid.uuid4(), email="johndoe@example.com", is_admin=False, is_active=True
+    )
+    token = create_token_set(user.id)
+    cases = (
+        ("/users/me", get_route("/api/v1/auth/users/me", "GET"), user),
+        ("/token", get_route("/api/v1/auth/token", "POST"), token),
+    )
+    for name, route, content in cases:
+
+        def default():
+            serialized = run_sync(
+                serialize_response(
+                    field=route.response_field,
+                    response_content=content,
+                    is_coroutine=True,
+                )
+            )
+            return JSONResponse(serialized).body
+
+        def fast():
+            return ModelJSONResponse(content).body
+
+        assert default() == fast()
+        results = {}
+        for label, func in (("default", default), ("model", fast)):
+            elapsed = timeit.timeit(func, number=args.number)
+            results[label] = elapsed / args.number * 1e6
+            print(f"{name:>10} {label:>8}: {results[label]:8.2f} us/response")
+        saved = results["default"] - results["model"]
+        print(f"{name:>10} {'saved':>8}: {saved:8.2f} us/response")
+
+
+if __name__ == "__main__":
+    main()
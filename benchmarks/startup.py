@@ -0,0 +1,86 @@
+"""
+Profile the startup of a worker: the import cost of every module pulled in
+by app.main, grouped by package, and the time to generate the OpenAPI schema.
+
+Usage:
+    python -m benchmarks.startup [--top 25] [--repeat 3]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+
+# Imported lazily by the app, listed when they are loaded at startup anyway
+DEFERRED_MODULES = ("asyncpg", "cryptography", "passlib", "uvicorn")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+app.openapi()
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "openapi_ms": (done - imported) * 1000,
+    "modules": sorted(m for m in sys.modules if m.split(".")[0] in %r),
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def profile() -> tuple[dict, dict[str, int]]:
+    """
+    Start a fresh interpreter with -X importtime and return the probe's
+    timings and the self time of every imported module in microseconds.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    self_us = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line.removeprefix("import time:").split("|")
+        if not fields[0].strip().isdigit():
+            continue  # Header line
+        self_us[fields[2].strip()] = int(fields[0])
+    return json.loads(process.stdout.splitlines()[-1]), self_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # The first run also compiles bytecode, keep the fastest one
+    runs = [profile() for _ in range(args.repeat)]
+    timings, self_us = min(runs, key=lambda run: run[0]["import_ms"])
+
+    packages: dict[str, int] = defaultdict(int)
+    for module, elapsed in self_us.items():
+        packages[module.split(".")[0]] += elapsed
+
+    print(f"import app.main: {timings['import_ms']:8.1f} ms")
+    print(f"app.openapi():   {timings['openapi_ms']:8.1f} ms")
+    print(f"\nTop {args.top} packages by import time:")
+    for package, elapsed in sorted(packages.items(), key=lambda i: -i[1])[: args.top]:
+        print(f"  {elapsed / 1000:8.1f} ms  {package}")
+    print(f"\nTop {args.top} modules by self import time:")
+    for module, elapsed in sorted(self_us.items(), key=lambda i: -i[1])[: args.top]:
+        print(f"  {elapsed / 1000:8.1f} ms  {module}")
+
+    loaded = {module.split(".")[0] for module in timings["modules"]}
+    print("\nDeferred imports:")
+    for module in DEFERRED_MODULES:
+        state = "imported at startup" if module in loaded else "deferred"
+        print(f"  {module}: {state}")
+
+
+if __name__ == "__main__":
+    main()
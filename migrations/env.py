@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from sqlmodel import SQLModel  # NEW
 
 # from app.models import Song  # NEW
+from app.auth.models.token import RevokedToken
 from app.auth.models.user import User
 
 # this is the Alembic Config object, which provides
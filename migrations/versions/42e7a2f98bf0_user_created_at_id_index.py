@@ -0,0 +1,37 @@
+"""user created_at id index
+
+Revision ID: 42e7a2f98bf0
+Revises: 0abc4c11dee2
+Create Date: 2026-10-18 11:02:15.904521
+
+"""
+import sqlalchemy as sa
+import sqlmodel  # NEW
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "42e7a2f98bf0"
+down_revision = "0abc4c11dee2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so large tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_auth_user_created_at_id",
+            "auth_user",
+            ["created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_auth_user_created_at_id",
+            table_name="auth_user",
+            postgresql_concurrently=True,
+        )
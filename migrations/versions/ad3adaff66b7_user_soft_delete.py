@@ -0,0 +1,106 @@
+"""user soft delete
+
+Downgrading permanently deletes the users that are soft deleted, the
+previous schema can't tell them apart from live users.
+
+Revision ID: ad3adaff66b7
+Revises: 42e7a2f98bf0
+Create Date: 2026-10-18 14:37:52.118730
+
+"""
+import sqlalchemy as sa
+import sqlmodel  # NEW
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "ad3adaff66b7"
+down_revision = "42e7a2f98bf0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A constant default doesn't rewrite the table
+    op.add_column(
+        "auth_user",
+        sa.Column(
+            "is_deleted",
+            sa.Boolean(),
+            server_default=sa.text("false"),
+            nullable=False,
+        ),
+    )
+    # Build the partial indexes before dropping the ones they replace, without
+    # blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_auth_user_email_not_deleted",
+            "auth_user",
+            ["email"],
+            unique=True,
+            postgresql_where=sa.text("NOT is_deleted"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_auth_user_created_at_id_not_deleted",
+            "auth_user",
+            ["created_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("NOT is_deleted"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_auth_user_updated_at_deleted",
+            "auth_user",
+            ["updated_at"],
+            unique=False,
+            postgresql_where=sa.text("is_deleted"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_auth_user_email",
+            table_name="auth_user",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_auth_user_created_at_id",
+            table_name="auth_user",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    # WARNING: soft-deleted users are deleted for good, they have to go first
+    # since their emails may not be unique
+    op.execute("DELETE FROM auth_user WHERE is_deleted")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_auth_user_created_at_id",
+            "auth_user",
+            ["created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_auth_user_email",
+            "auth_user",
+            ["email"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_auth_user_updated_at_deleted",
+            table_name="auth_user",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_auth_user_created_at_id_not_deleted",
+            table_name="auth_user",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_auth_user_email_not_deleted",
+            table_name="auth_user",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("auth_user", "is_deleted")
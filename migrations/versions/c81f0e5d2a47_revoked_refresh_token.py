@@ -0,0 +1,55 @@
+"""revoked refresh token
+
+Revision ID: c81f0e5d2a47
+Revises: ad3adaff66b7
+Create Date: 2026-10-18 17:12:40.582316
+
+"""
+import sqlalchemy as sa
+import sqlmodel  # NEW
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c81f0e5d2a47"
+down_revision = "ad3adaff66b7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "auth_revoked_token",
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("current_timestamp(0)"),
+            nullable=False,
+        ),
+        sa.Column("jti", sqlmodel.sql.sqltypes.GUID(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["auth_user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("jti"),
+    )
+    op.create_index(
+        op.f("ix_auth_revoked_token_expires_at"),
+        "auth_revoked_token",
+        ["expires_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_auth_revoked_token_user_id"),
+        "auth_revoked_token",
+        ["user_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_auth_revoked_token_user_id"), table_name="auth_revoked_token"
+    )
+    op.drop_index(
+        op.f("ix_auth_revoked_token_expires_at"), table_name="auth_revoked_token"
+    )
+    op.drop_table("auth_revoked_token")
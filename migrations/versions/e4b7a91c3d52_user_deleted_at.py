@@ -0,0 +1,56 @@
+"""user deleted at
+
+Revision ID: e4b7a91c3d52
+Revises: c81f0e5d2a47
+Create Date: 2026-10-18 21:05:13.402917
+
+"""
+import sqlalchemy as sa
+import sqlmodel  # NEW
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e4b7a91c3d52"
+down_revision = "c81f0e5d2a47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("auth_user", sa.Column("deleted_at", sa.DateTime(), nullable=True))
+    # The best guess for users deleted before, their last update
+    op.execute("UPDATE auth_user SET deleted_at = updated_at WHERE is_deleted")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_auth_user_deleted_at_deleted",
+            "auth_user",
+            ["deleted_at"],
+            unique=False,
+            postgresql_where=sa.text("is_deleted"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_auth_user_updated_at_deleted",
+            table_name="auth_user",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    # Deletion times are lost, the purge job of the previous revision counts
+    # the retention of soft-deleted users from their last update again
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_auth_user_updated_at_deleted",
+            "auth_user",
+            ["updated_at"],
+            unique=False,
+            postgresql_where=sa.text("is_deleted"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_auth_user_deleted_at_deleted",
+            table_name="auth_user",
+            postgresql_concurrently=True,
+        )
+    op.drop_column("auth_user", "deleted_at")
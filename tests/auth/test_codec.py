@@ -0,0 +1,117 @@
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from httpx import AsyncClient
+
+from app.auth.codec import (
+    ExpiredSignatureError,
+    JWTError,
+    KeyRing,
+    b64encode,
+    create_codec,
+)
+from app.core.config import JWTKeyConfig, settings
+
+
+def private_pem(key) -> str:
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def public_pem(key) -> str:
+    return (
+        key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        .decode()
+    )
+
+
+rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+ed25519_key = ed25519.Ed25519PrivateKey.generate()
+KEYS = {
+    "HS256": ("secret", "secret"),
+    "RS256": (private_pem(rsa_key), public_pem(rsa_key)),
+    "EdDSA": (private_pem(ed25519_key), public_pem(ed25519_key)),
+}
+
+
+@pytest.mark.parametrize("alg", KEYS)
+def test_sign_and_verify(alg):
+    private, public = KEYS[alg]
+    signer = KeyRing(create_codec(alg, private))
+    claims = {"sub": "user", "exp": int(time.time()) + 60}
+    token = signer.encode(claims)
+    assert signer.decode(token) == claims
+
+    # Asymmetric tokens verify with the public key alone
+    verifier = KeyRing(signer.signing_key, [create_codec(alg, public, kid="public")])
+    assert verifier.decode(token) == claims
+
+    tampered = token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB")
+    with pytest.raises(JWTError):
+        signer.decode(tampered)
+
+
+def test_expired_token():
+    keyring = KeyRing(create_codec("HS256", "secret"))
+    token = keyring.encode({"sub": "user", "exp": int(time.time()) - 1})
+    with pytest.raises(ExpiredSignatureError):
+        keyring.decode(token)
+
+
+def test_key_rotation():
+    old = create_codec("HS256", "old")
+    new = create_codec("EdDSA", KEYS["EdDSA"][0])
+    token = KeyRing(old).encode({"sub": "user"})
+
+    assert KeyRing(new, [old]).decode(token) == {"sub": "user"}
+    with pytest.raises(JWTError):
+        KeyRing(new).decode(token)
+
+
+def test_algorithm_is_taken_from_the_key():
+    # An HS256 token keyed with the public key must not pass as RS256
+    keyring = KeyRing(create_codec("RS256", KEYS["RS256"][0]))
+    forged = KeyRing(create_codec("HS256", KEYS["RS256"][1], keyring.signing_key.kid))
+    with pytest.raises(JWTError):
+        keyring.decode(forged.encode({"sub": "admin"}))
+
+    header = b64encode(b'{"alg":"none","typ":"JWT"}').decode()
+    payload = b64encode(b'{"sub":"admin"}').decode()
+    with pytest.raises(JWTError):
+        keyring.decode(f"{header}.{payload}.")
+
+
+def test_token_without_kid():
+    codec = create_codec("HS256", "secret")
+    signing_input = (
+        b64encode(b'{"alg":"HS256","typ":"JWT"}') + b"." + b64encode(b'{"sub":"user"}')
+    )
+    token = signing_input + b"." + b64encode(codec.sign(signing_input))
+    assert KeyRing(codec).decode(token.decode()) == {"sub": "user"}
+
+
+@pytest.mark.asyncio
+async def test_jwks(async_client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(
+        settings,
+        "JWT_VERIFICATION_KEYS",
+        [JWTKeyConfig(alg="RS256", key=KEYS["RS256"][1], kid="next")],
+    )
+    response = await async_client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == (
+        f"public, max-age={settings.JWKS_MAX_AGE_SECS}"
+    )
+    # The HS256 secret isn't published
+    (key,) = response.json()["keys"]
+    assert key["kid"] == "next"
+    assert key["kty"] == "RSA"
+    assert key["alg"] == "RS256"
@@ -0,0 +1,93 @@
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from app.auth.crud.user import UsersCRUD
+from app.auth.models.user import User, UserCreate, UserPatch
+from tests.conftest import engine
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.asyncio
+async def test_create_is_one_statement(db_session: AsyncSession):
+    users_crud = UsersCRUD(session=db_session)
+    data = UserCreate(email="new@example.com", password="secret")
+    with count_statements() as statements:
+        user = await users_crud.create(data)
+    assert len(statements) == 1
+    assert user.email == "new@example.com"
+
+
+@pytest.mark.asyncio
+async def test_create_duplicate_email(db_session: AsyncSession, users: dict[str, User]):
+    users_crud = UsersCRUD(session=db_session)
+    data = UserCreate(email="testuser@example.com", password="secret")
+    with pytest.raises(HTTPException) as exc_info:
+        await users_crud.create(data)
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_update_is_one_statement(
+    db_session: AsyncSession, users: dict[str, User]
+):
+    users_crud = UsersCRUD(session=db_session)
+    user_id = users["testuser"].id
+    with count_statements() as statements:
+        user = await users_crud.update(user_id, UserPatch(is_active=True))
+    assert len(statements) == 1
+    assert user.is_active is True
+
+
+@pytest.mark.asyncio
+async def test_delete_is_one_statement(
+    db_session: AsyncSession, users: dict[str, User]
+):
+    users_crud = UsersCRUD(session=db_session)
+    user_id = users["testuser"].id
+    with count_statements() as statements:
+        assert await users_crud.delete(user_id)
+    assert len(statements) == 1
+
+    with pytest.raises(HTTPException) as exc_info:
+        await users_crud.delete(user_id)
+    assert exc_info.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_share_one_query(
+    db_session: AsyncSession, users: dict[str, User]
+):
+    # Every lookup has its own CRUD, they only share the session in tests
+    lookups = [
+        UsersCRUD(session=db_session).get(id=users["testuser"].id),
+        UsersCRUD(session=db_session).get(id=str(users["testuser"].id)),
+        UsersCRUD(session=db_session).get(id=users["admin"].id),
+    ]
+    with count_statements() as statements:
+        found = await asyncio.gather(*lookups)
+    assert len(statements) == 1
+    assert [user.id for user in found] == [
+        users["testuser"].id,
+        users["testuser"].id,
+        users["admin"].id,
+    ]
+    # Copies, not one shared instance
+    assert found[0] is not found[1]
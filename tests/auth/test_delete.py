@@ -46,3 +46,22 @@ async def test_delete_user_unauthorized(
     url = f"{endpoint}/{user_id}"
     response = await async_client.delete(url, headers=headers)
     assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_deleted_user_email_can_register_again(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    # Deletion is soft, the user disappears but its email becomes free
+    token = create_token_set(users.get("admin").id)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    url = f"{endpoint}/{users.get('testuser').id}"
+    response = await async_client.delete(url, headers=headers)
+    assert response.status_code == 200
+
+    response = await async_client.delete(url, headers=headers)
+    assert response.status_code == 404
+
+    user_data = {"email": "testuser@example.com", "password": "newpass"}
+    response = await async_client.post(endpoint, json=user_data)
+    assert response.status_code == 201
@@ -0,0 +1,57 @@
+import csv
+import json
+from typing import Literal
+
+import pytest
+from httpx import AsyncClient
+
+from app.auth.jwt import create_token_set
+from app.auth.models.user import User
+
+endpoint = "/api/v1/auth/users/export"
+user_keys = Literal["testuser", "admin"]
+
+
+def admin_headers(users: dict[user_keys, User]) -> dict:
+    token = create_token_set(users.get("admin").id)
+    return {"Authorization": f"Bearer {token.access_token}"}
+
+
+@pytest.mark.asyncio
+async def test_export_csv(async_client: AsyncClient, users: dict[user_keys, User]):
+    response = await async_client.get(endpoint, headers=admin_headers(users))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(response.text.splitlines()))
+    assert sorted(row["email"] for row in rows) == sorted(
+        user.email for user in users.values()
+    )
+    assert list(rows[0]) == ["id", "email", "is_admin", "is_active"]
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson_gzip(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    params = {"format": "ndjson", "gzip": True}
+    response = await async_client.get(
+        endpoint, params=params, headers=admin_headers(users)
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+
+    # httpx transparently decompresses the body
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == len(users)
+    assert "token_version" not in rows[0]
+
+
+@pytest.mark.asyncio
+async def test_export_unauthorized(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    token = create_token_set(users.get("testuser").id)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    response = await async_client.get(endpoint, headers=headers)
+    assert response.status_code == 403
@@ -26,3 +26,68 @@ async def test_get_user_account_unauthenticated(async_client: AsyncClient):
     # Try to access the /users/me endpoint without authentication
     response = await async_client.get(endpoint)
     assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_get_user_account_after_update(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    # The cached principal must be invalidated when the user is updated
+    user_token = create_token_set(users.get("testuser").id)
+    user_headers = {"Authorization": f"Bearer {user_token.access_token}"}
+    response = await async_client.get(endpoint, headers=user_headers)
+    assert response.json()["is_active"] is False
+
+    admin_token = create_token_set(users.get("admin").id)
+    admin_headers = {"Authorization": f"Bearer {admin_token.access_token}"}
+    update_data = {"user_id": str(users.get("testuser").id), "is_active": True}
+    await async_client.patch(
+        "/api/v1/auth/users", json=update_data, headers=admin_headers
+    )
+
+    response = await async_client.get(endpoint, headers=user_headers)
+    assert response.json()["is_active"] is True
+
+
+@pytest.mark.asyncio
+async def test_get_user_account_query_count(
+    async_client: AsyncClient, users: dict[user_keys, User], assert_max_queries
+):
+    token = create_token_set(users.get("testuser").id)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    with assert_max_queries(1):
+        response = await async_client.get(endpoint, headers=headers)
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Queries"]) <= 1
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+@pytest.mark.asyncio
+async def test_get_user_account_not_modified(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    user_token = create_token_set(users.get("testuser").id)
+    user_headers = {"Authorization": f"Bearer {user_token.access_token}"}
+    response = await async_client.get(endpoint, headers=user_headers)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert set(response.json()) == {"id", "email", "is_admin", "is_active"}
+    etag = response.headers["ETag"]
+
+    headers = {**user_headers, "If-None-Match": etag}
+    response = await async_client.get(endpoint, headers=headers)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    admin_token = create_token_set(users.get("admin").id)
+    admin_headers = {"Authorization": f"Bearer {admin_token.access_token}"}
+    update_data = {"user_id": str(users.get("testuser").id), "is_active": True}
+    await async_client.patch(
+        "/api/v1/auth/users", json=update_data, headers=admin_headers
+    )
+
+    response = await async_client.get(endpoint, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["is_active"] is True
@@ -0,0 +1,137 @@
+import json
+from typing import Literal
+
+import pytest
+from httpx import AsyncClient
+
+from app.auth.importer import iter_lines
+from app.auth.jwt import create_token_set
+from app.auth.models.user import User
+from app.auth.security import get_password_hash
+from app.core.config import settings
+
+endpoint = "/api/v1/auth/users/import"
+user_keys = Literal["testuser", "admin"]
+
+
+def admin_headers(users: dict[user_keys, User], content_type: str) -> dict:
+    token = create_token_set(users.get("admin").id)
+    return {
+        "Authorization": f"Bearer {token.access_token}",
+        "Content-Type": content_type,
+    }
+
+
+@pytest.mark.asyncio
+async def test_import_ndjson(async_client: AsyncClient, users: dict[user_keys, User]):
+    rows = [
+        {"email": "new1@example.com", "password": "pass1"},
+        {"email": "new2@example.com", "password_hash": get_password_hash("pass2")},
+        {"email": "new1@example.com", "password": "pass1"},
+        {"email": "testuser@example.com", "password": "pass"},
+        {"email": "not-an-email", "password": "pass"},
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n{broken\n"
+    headers = admin_headers(users, "application/x-ndjson")
+    response = await async_client.post(endpoint, content=body, headers=headers)
+    assert response.status_code == 200
+
+    *report, summary = [json.loads(line) for line in response.text.splitlines()]
+    report.sort(key=lambda row: row["line"])
+    assert [row["status"] for row in report] == [
+        "created",
+        "created",
+        "duplicate",
+        "exists",
+        "invalid",
+        "invalid",
+    ]
+    assert summary == {
+        "summary": {"created": 2, "exists": 1, "duplicate": 1, "invalid": 2}
+    }
+
+    login_data = {"username": "new2@example.com", "password": "pass2"}
+    response = await async_client.post("/api/v1/auth/token", data=login_data)
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_import_csv(async_client: AsyncClient, users: dict[user_keys, User]):
+    body = "email,password,is_active\r\nnew@example.com,secret,true\r\n"
+    headers = admin_headers(users, "text/csv")
+    response = await async_client.post(endpoint, content=body, headers=headers)
+    assert response.status_code == 200
+    assert json.loads(response.text.splitlines()[0])["status"] == "created"
+
+
+@pytest.mark.asyncio
+async def test_import_skips_lines_that_are_not_utf8(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    body = b"email,password\n" b"\xff\xfe,secret\n" b"new@example.com,secret\n"
+    headers = admin_headers(users, "text/csv")
+    response = await async_client.post(endpoint, content=body, headers=headers)
+    assert response.status_code == 200
+
+    *report, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["line"], row["status"]) for row in report] == [
+        (2, "invalid"),
+        (3, "created"),
+    ]
+    assert summary["summary"]["invalid"] == 1
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_across_chunks():
+    async def stream():
+        for chunk in (b"ab", b"c\nde", b"\n\nlong", b"er than five\nf"):
+            yield chunk
+
+    lines = [line async for line in iter_lines(stream(), max_length=5)]
+    assert lines == ["abc", "de", "", None, "f"]
+
+
+@pytest.mark.asyncio
+async def test_import_limits(
+    async_client: AsyncClient, users: dict[user_keys, User], monkeypatch
+):
+    monkeypatch.setattr(settings, "USER_IMPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "USER_IMPORT_MAX_LINE_BYTES", 32)
+    body = (
+        b"email,password\n"
+        b"new@example.com,secret\n"
+        b"new@example.com,secret\n" + b"x" * 100 + b"\n"
+    )
+    headers = admin_headers(users, "text/csv")
+    response = await async_client.post(endpoint, content=body, headers=headers)
+    assert response.status_code == 200
+    *report, summary = [json.loads(line) for line in response.text.splitlines()]
+    # Duplicates are found across batches
+    assert [(row["line"], row["status"]) for row in report] == [
+        (2, "created"),
+        (3, "duplicate"),
+        (4, "invalid"),
+    ]
+
+    monkeypatch.setattr(settings, "USER_IMPORT_MAX_BODY_BYTES", 16)
+    response = await async_client.post(endpoint, content=body, headers=headers)
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_import_unsupported_media_type(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    headers = admin_headers(users, "application/json")
+    response = await async_client.post(endpoint, content="[]", headers=headers)
+    assert response.status_code == 415
+
+
+@pytest.mark.asyncio
+async def test_import_unauthorized(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    token = create_token_set(users.get("testuser").id)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    response = await async_client.post(endpoint, content="", headers=headers)
+    assert response.status_code == 403
@@ -0,0 +1,23 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from app.auth.codec import JWTError
+from app.auth.jwt import create_jwt_token, decode_token, decoded_tokens
+from app.core.config import settings
+
+
+def test_decode_token_is_memoized():
+    token = create_jwt_token(uuid.uuid4(), "access", timedelta(minutes=5))
+    hits = decoded_tokens.hits
+    assert decode_token(token) == decode_token(token)
+    assert decoded_tokens.hits == hits + 1
+
+
+def test_decode_token_respects_secret(monkeypatch):
+    token = create_jwt_token(uuid.uuid4(), "access", timedelta(minutes=5))
+    decode_token(token)
+    monkeypatch.setattr(settings, "JWT_SECRET_KEY", "rotated")
+    with pytest.raises(JWTError):
+        decode_token(token)
@@ -0,0 +1,68 @@
+from typing import Literal
+
+import pytest
+from httpx import AsyncClient
+
+from app.auth.jwt import create_token_set
+from app.auth.models.user import User
+
+endpoint = "/api/v1/auth/users"
+user_keys = Literal["testuser", "admin"]
+
+
+def admin_headers(users: dict[user_keys, User]) -> dict:
+    token = create_token_set(users.get("admin").id)
+    return {"Authorization": f"Bearer {token.access_token}"}
+
+
+@pytest.mark.asyncio
+async def test_list_users_paginated(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    headers = admin_headers(users)
+    emails = []
+    params = {"limit": 2}
+    while True:
+        response = await async_client.get(endpoint, params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 2
+        emails += [item["email"] for item in page["items"]]
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    assert sorted(emails) == sorted(user.email for user in users.values())
+
+
+@pytest.mark.asyncio
+async def test_list_users_filtered(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    headers = admin_headers(users)
+    params = {"is_admin": False, "email_prefix": "testuser2"}
+    response = await async_client.get(endpoint, params=params, headers=headers)
+    assert response.status_code == 200
+    assert [item["email"] for item in response.json()["items"]] == [
+        "testuser2@example.com"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_list_users_invalid_cursor(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    headers = admin_headers(users)
+    params = {"cursor": "not-a-cursor"}
+    response = await async_client.get(endpoint, params=params, headers=headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_users_unauthorized(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    token = create_token_set(users.get("testuser").id)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    response = await async_client.get(endpoint, headers=headers)
+    assert response.status_code == 403
@@ -2,9 +2,12 @@ from typing import Literal
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio.session import AsyncSession
 
 from app.auth.models.jwt import Token
 from app.auth.models.user import User
+from app.auth.security import create_pwd_context, password_needs_update
+from app.core.config import settings
 
 endpoint = "/api/v1/auth/token"
 user_keys = Literal["testuser", "admin"]
@@ -40,3 +43,55 @@ async def test_missing_credentials(async_client: AsyncClient):
     login_data = {}  # No username or password provided
     response = await async_client.post(endpoint, data=login_data)
     assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_login_rate_limit(
+    async_client: AsyncClient, users: dict[user_keys, User], monkeypatch
+):
+    from app.auth import jwt
+
+    # Successful logins don't count against the email
+    login_data = {"username": "testuser@example.com", "password": "userpass"}
+    for _ in range(settings.LOGIN_RATE_LIMIT_PER_EMAIL + 1):
+        response = await async_client.post(endpoint, data=login_data)
+        assert response.status_code == 200
+
+    login_data = {"username": "testuser@example.com", "password": "wrongpass"}
+    for _ in range(settings.LOGIN_RATE_LIMIT_PER_EMAIL):
+        response = await async_client.post(endpoint, data=login_data)
+        assert response.status_code == 401
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("Throttled logins must not reach authentication")
+
+    monkeypatch.setattr(jwt.password_hasher, "verify", fail)
+    response = await async_client.post(endpoint, data=login_data)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+    # The limit is per email, other users can still log in
+    login_data = {"username": "admin@example.com", "password": "adminpass"}
+    monkeypatch.undo()
+    response = await async_client.post(endpoint, data=login_data)
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_login_upgrades_outdated_hash(
+    async_client: AsyncClient, db_session: AsyncSession, users: dict[user_keys, User]
+):
+    user = users.get("testuser")
+    user.password = create_pwd_context(bcrypt_rounds=4).hash("userpass")
+    await db_session.commit()
+    assert password_needs_update(user.password)
+
+    login_data = {"username": user.email, "password": "userpass"}
+    response = await async_client.post(endpoint, data=login_data)
+    assert response.status_code == 200
+
+    # The new hash is stored once the response was sent
+    await db_session.refresh(user)
+    assert not password_needs_update(user.password)
+    response = await async_client.post(endpoint, data=login_data)
+    assert response.status_code == 200
@@ -81,3 +81,16 @@ async def test_update_user_invalid_data(
     update_data = {}  # No fields provided
     response = await async_client.patch(endpoint, json=update_data, headers=headers)
     assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_update_user_query_count(
+    async_client: AsyncClient, users: dict[user_keys, User], assert_max_queries
+):
+    # Loading the current user and a single UPDATE ... RETURNING
+    token = create_token_set(users.get("admin").id)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    update_data = {"user_id": str(users.get("testuser").id), "is_active": True}
+    with assert_max_queries(2):
+        response = await async_client.patch(endpoint, json=update_data, headers=headers)
+    assert response.status_code == 200
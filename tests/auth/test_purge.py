@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio.session import AsyncSession, async_sessionmaker
+
+from app.auth.crud.user import UsersCRUD
+from app.auth.models.user import User
+from app.auth.purge import purge_deleted_users
+
+
+@pytest.mark.asyncio
+async def test_purge_deleted_users(db_session: AsyncSession, users: dict[str, User]):
+    users_crud = UsersCRUD(session=db_session)
+    await users_crud.delete(users["testuser"].id)
+    await users_crud.delete(users["testuser2"].id)
+
+    session_factory = async_sessionmaker(bind=db_session.bind, expire_on_commit=False)
+    purge_kwargs = {"batch_size": 1, "pause": 0}
+    # Users deleted within this very transaction aren't old enough yet
+    assert (
+        await purge_deleted_users(
+            session_factory, retention=timedelta(hours=1), **purge_kwargs
+        )
+        == 0
+    )
+    assert (
+        await purge_deleted_users(
+            session_factory, retention=timedelta(seconds=-1), **purge_kwargs
+        )
+        == 2
+    )
+
+    result = await db_session.execute(select(func.count()).select_from(User))
+    assert result.scalar_one() == 1
+
+
+@pytest.mark.asyncio
+async def test_purge_counts_retention_from_deletion(
+    db_session: AsyncSession, users: dict[str, User]
+):
+    users_crud = UsersCRUD(session=db_session)
+    await users_crud.delete(users["testuser"].id)
+    # Deleted two hours ago, written to since
+    await db_session.execute(
+        update(User)
+        .where(User.id == users["testuser"].id)
+        .values(deleted_at=func.localtimestamp() - timedelta(hours=2))
+    )
+    await db_session.commit()
+
+    session_factory = async_sessionmaker(bind=db_session.bind, expire_on_commit=False)
+    purged = await purge_deleted_users(
+        session_factory, retention=timedelta(hours=1), batch_size=10, pause=0
+    )
+    assert purged == 1
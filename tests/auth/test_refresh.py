@@ -0,0 +1,94 @@
+from datetime import timedelta
+from typing import Literal
+
+import pytest
+from httpx import AsyncClient, Response
+from sqlalchemy.ext.asyncio.session import AsyncSession, async_sessionmaker
+
+from app.auth.crud.token import RevokedTokensCRUD
+from app.auth.jwt import create_token_set, validate_refresh_token
+from app.auth.models.jwt import Token
+from app.auth.models.user import User
+from app.auth.purge import purge_expired_tokens
+
+endpoint = "/api/v1/auth/token"
+user_keys = Literal["testuser", "admin"]
+
+
+async def refresh(async_client: AsyncClient, token: Token) -> Response:
+    response = await async_client.put(
+        endpoint,
+        json={"refresh_token": token.refresh_token},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+    return response
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_token(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    user = users.get("testuser")
+    token = create_token_set(user.id, user=user)
+    response = await refresh(async_client, token)
+    assert response.status_code == 200
+    new_refresh_token = response.json()["refresh_token"]
+    assert new_refresh_token != token.refresh_token
+    assert validate_refresh_token(new_refresh_token).jti is not None
+
+
+@pytest.mark.asyncio
+async def test_refresh_with_invalid_token(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    user = users.get("testuser")
+    token = create_token_set(user.id, user=user)
+    token.refresh_token = "garbage"
+    response = await refresh(async_client, token)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_reused_refresh_token_revokes_all_tokens(
+    async_client: AsyncClient, users: dict[user_keys, User]
+):
+    user = users.get("testuser")
+    token = create_token_set(user.id, user=user)
+    response = await refresh(async_client, token)
+    assert response.status_code == 200
+    rotated = response.json()
+
+    response = await refresh(async_client, token)
+    assert response.status_code == 401
+
+    # The tokens issued by the rotation are revoked with the rest
+    response = await async_client.put(
+        endpoint,
+        json={"refresh_token": rotated["refresh_token"]},
+        headers={"Authorization": f"Bearer {rotated['access_token']}"},
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_expired_revoked_tokens_are_purged(
+    db_session: AsyncSession, users: dict[user_keys, User]
+):
+    user = users.get("testuser")
+    payloads = [
+        validate_refresh_token(create_token_set(user.id, user=user).refresh_token)
+        for _ in range(2)
+    ]
+    tokens_crud = RevokedTokensCRUD(session=db_session)
+    expires_at = payloads[0].exp.replace(tzinfo=None)
+    assert await tokens_crud.revoke(payloads[0].jti, user.id, expires_at)
+    assert not await tokens_crud.revoke(payloads[0].jti, user.id, expires_at)
+    assert await tokens_crud.revoke(
+        payloads[1].jti, user.id, expires_at - timedelta(days=30)
+    )
+
+    session_factory = async_sessionmaker(bind=db_session.bind, expire_on_commit=False)
+    purged = await purge_expired_tokens(session_factory, batch_size=10, pause=0)
+    assert purged == 1
+    # Still revoked until it expires
+    assert not await tokens_crud.revoke(payloads[0].jti, user.id, expires_at)
@@ -0,0 +1,105 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth import calibrate
+from app.auth.security import PasswordHasher, get_hash_worker_count, password_hasher
+from app.core.config import settings
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_in_pool():
+    hashed = await password_hasher.hash("secret")
+    assert hashed != "secret"
+    assert await password_hasher.verify("secret", hashed)
+    assert not await password_hasher.verify("wrong", hashed)
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_queue_is_full():
+    hasher = PasswordHasher(workers=1, queue_size=0)
+    try:
+        results = await asyncio.gather(
+            hasher.hash("first"),
+            hasher.hash("second"),
+            return_exceptions=True,
+        )
+        assert isinstance(results[0], str)
+        assert isinstance(results[1], HTTPException)
+        assert results[1].status_code == 503
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_timed_out_job_keeps_its_slot():
+    hasher = PasswordHasher(workers=1, queue_size=0, timeout=0.001)
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            await hasher.hash("slow")
+        assert exc_info.value.status_code == 503
+        # Still hashing in the worker, nothing else is accepted meanwhile
+        assert hasher._pending == 1
+        with pytest.raises(HTTPException):
+            await hasher.hash("next")
+
+        while hasher._pending:
+            await asyncio.sleep(0.01)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_bulk_hashing_leaves_room_for_logins():
+    hasher = PasswordHasher(workers=3, queue_size=0, bulk_chunk_size=1)
+    try:
+        bulk = asyncio.create_task(hasher.hash_many(["a", "b", "c", "h", "i"]))
+        await asyncio.sleep(0.01)
+        # Chunks run on every worker but one, which stays free for logins
+        assert hasher._pending == 2
+        assert await hasher.verify("d", await hasher.hash("d"))
+        hashes = await bulk
+        assert len(hashes) == 5
+        assert await hasher.verify("c", hashes[2])
+        assert await hasher.verify("i", hashes[4])
+
+        # Bulk chunks wait for a slot instead of being rejected
+        results = await asyncio.gather(
+            *(hasher.hash(password) for password in "efg"), hasher.hash_many(["j"])
+        )
+        assert len(results[3]) == 1
+    finally:
+        hasher.shutdown()
+
+
+def test_hash_workers_share_the_cpus(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", None)
+    monkeypatch.setattr(settings, "SERVER_WORKERS", None)
+    assert get_hash_worker_count() == 8
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 3)
+    assert get_hash_worker_count() == 2
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 16)
+    assert get_hash_worker_count() == 1
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 4)
+    assert get_hash_worker_count() == 4
+
+
+def test_calibrate_bcrypt(monkeypatch):
+    # Every round doubles the cost, 11 rounds take 200ms
+    monkeypatch.setattr(
+        calibrate,
+        "measure",
+        lambda repeat, scheme, bcrypt_rounds: 0.2 * 2 ** (bcrypt_rounds - 11),
+    )
+    assert calibrate.calibrate_bcrypt(target=0.25, repeat=1) == {
+        "PASSWORD_HASH_SCHEME": "bcrypt",
+        "PASSWORD_BCRYPT_ROUNDS": 11,
+    }
+    # Never below the minimum cost
+    assert calibrate.calibrate_bcrypt(target=0.01, repeat=1) == {
+        "PASSWORD_HASH_SCHEME": "bcrypt",
+        "PASSWORD_BCRYPT_ROUNDS": calibrate.MIN_BCRYPT_ROUNDS,
+    }
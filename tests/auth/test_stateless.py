@@ -0,0 +1,58 @@
+from typing import Literal
+
+import pytest
+from httpx import AsyncClient
+
+from app.auth.jwt import create_token_set
+from app.auth.models.user import User
+from app.core.config import settings
+
+endpoint = "/api/v1/auth/users"
+user_keys = Literal["testuser", "admin"]
+
+
+@pytest.fixture()
+def stateless_auth(monkeypatch):
+    monkeypatch.setattr(settings, "JWT_STATELESS_AUTH", True)
+
+
+@pytest.mark.asyncio
+async def test_principal_is_built_from_claims(
+    async_client: AsyncClient, users: dict[user_keys, User], stateless_auth
+):
+    # Tokens with claims are authorized from them, older ones from the database
+    user = users.get("testuser")
+    token = create_token_set(user.id, user=user)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    response = await async_client.get(f"{endpoint}/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == user.email
+
+    token = create_token_set(users.get("admin").id)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    response = await async_client.get(f"{endpoint}/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["is_admin"] is True
+
+
+@pytest.mark.asyncio
+async def test_version_bump_revokes_claims(
+    async_client: AsyncClient, users: dict[user_keys, User], stateless_auth
+):
+    user = users.get("testuser")
+    token = create_token_set(user.id, user=user)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+    response = await async_client.patch(
+        endpoint, json={"password": "newpass"}, headers=headers
+    )
+    assert response.status_code == 200
+
+    response = await async_client.get(f"{endpoint}/me", headers=headers)
+    assert response.status_code == 401
+
+    response = await async_client.put(
+        "/api/v1/auth/token",
+        json={"refresh_token": token.refresh_token},
+        headers=headers,
+    )
+    assert response.status_code == 401
@@ -1,5 +1,6 @@
 import asyncio
-from typing import AsyncGenerator, Callable, Generator
+from contextlib import contextmanager
+from typing import AsyncGenerator, Callable, Generator, Iterator
 
 import pytest
 import pytest_asyncio
@@ -9,15 +10,19 @@ from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.asyncio.session import AsyncSession, async_sessionmaker
 from sqlmodel import SQLModel, select
 
+from app.auth.jwt import rate_limit_backend
+from app.auth.models.token import RevokedToken  # noqa: F401
 from app.auth.models.user import User
 from app.auth.security import get_password_hash
 from app.core.config import settings
+from app.core.querystats import QueryStats, instrument_queries, track_queries
 
 engine = create_async_engine(
     settings.DB_CONN_STR.unicode_string(),
     echo=settings.is_debug,
     future=True,
 )
+instrument_queries(engine.sync_engine)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
 
@@ -28,6 +33,12 @@ def event_loop(request) -> Generator:
     loop.close()
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def reset_rate_limits():
+    # Every test client logs in from 127.0.0.1
+    await rate_limit_backend.reset()
+
+
 @pytest_asyncio.fixture()
 async def db_session() -> AsyncSession:
     async with engine.begin() as conn:
@@ -47,6 +58,27 @@ def override_get_db(db_session: AsyncSession) -> Callable:
     return _override_get_db
 
 
+@pytest.fixture()
+def assert_max_queries() -> Callable:
+    """
+    Context manager failing the test when the block executes more than
+    ``limit`` statements, e.g. ``with assert_max_queries(2): await client.get(...)``
+    """
+
+    @contextmanager
+    def _assert_max_queries(limit: int) -> Iterator[QueryStats]:
+        with track_queries() as stats:
+            yield stats
+        statements = "\n".join(
+            f"{count} x {statement}" for statement, count in stats.statements.items()
+        )
+        assert (
+            stats.count <= limit
+        ), f"{stats.count} statements executed, at most {limit} expected:\n{statements}"
+
+    return _assert_max_queries
+
+
 @pytest.fixture()
 def app(override_get_db: Callable) -> FastAPI:
     from app.core.db import get_async_session
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.core.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    DecayingMax,
+    Priority,
+    admission_controller,
+)
+from app.core.drain import RequestTracker
+
+
+def test_decaying_max(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    signal = DecayingMax(half_life=1.0)
+    signal.observe(0.4)
+    signal.observe(0.1)
+    assert signal.get() == 0.4
+
+    now += 2
+    assert signal.get() == pytest.approx(0.1)
+
+
+def test_priorities_are_shed_in_order():
+    tracker = RequestTracker()
+    controller = AdmissionController(
+        max_loop_lag=0.2, max_pool_wait=0, max_in_flight=10, tracker=tracker
+    )
+    assert all(controller.admit(priority) for priority in Priority)
+
+    tracker.in_flight = 8
+    assert not controller.admit(Priority.LOW)
+    assert controller.admit(Priority.NORMAL)
+
+    controller.loop_lag.observe(0.25)
+    assert controller.stats()["shedding"] == ["normal", "low"]
+    assert controller.admit(Priority.HIGH)
+
+    tracker.in_flight = 20
+    assert not controller.admit(Priority.HIGH)
+    assert controller.admit(Priority.CRITICAL)
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_is_measured():
+    controller = AdmissionController(
+        max_loop_lag=0.2, max_pool_wait=0, max_in_flight=0, lag_interval=0.01
+    )
+    controller.start()
+    try:
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)
+        await asyncio.sleep(0.02)
+    finally:
+        await controller.stop()
+    assert controller.loop_lag.get() >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_low_priority_requests():
+    tracker = RequestTracker()
+    controller = AdmissionController(
+        max_loop_lag=0, max_pool_wait=1.0, max_in_flight=0, tracker=tracker
+    )
+    app = FastAPI()
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=controller,
+        critical_paths=frozenset({"/health"}),
+        low_priority=frozenset({("POST", "/token"), ("GET", "/export")}),
+    )
+
+    @app.get("/health")
+    @app.get("/export")
+    @app.get("/me")
+    @app.post("/token")
+    async def endpoint():
+        return {}
+
+    controller.observe_pool_wait(0.9)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/token")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+
+        headers = {"Authorization": "Bearer token"}
+        assert (await client.get("/me", headers=headers)).status_code == 200
+        # Credentials don't lift low priority reads
+        assert (await client.get("/export", headers=headers)).status_code == 503
+        assert (await client.get("/health")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_health_check_reports_shedding(async_client: AsyncClient, monkeypatch):
+    response = await async_client.get("/")
+    assert response.json()["status"] == "ok"
+
+    monkeypatch.setattr(admission_controller.pool_wait, "get", lambda: 10.0)
+    response = await async_client.get("/")
+    assert response.status_code == 200
+    assert response.json()["status"] == "shedding"
+    assert response.json()["admission"]["shedding"] == ["high", "normal", "low"]
+
+    response = await async_client.post(
+        "/api/v1/auth/token", data={"username": "a@example.com", "password": "x"}
+    )
+    assert response.status_code == 503
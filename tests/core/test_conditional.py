@@ -0,0 +1,38 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.conditional import ConditionalGet, conditional_get, make_etag
+from app.core.responses import ModelJSONResponse
+
+app = FastAPI()
+built = []
+
+
+@app.get("/resource")
+def get_resource(conditional: ConditionalGet = conditional_get("public, max-age=60")):
+    def build():
+        built.append(True)
+        return ModelJSONResponse({"version": 1})
+
+    return conditional.respond(make_etag("resource", 1), build)
+
+
+def test_if_none_match():
+    client = TestClient(app)
+    etag = make_etag("resource", 1)
+    built.clear()
+
+    response = client.get("/resource")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == "public, max-age=60"
+
+    for if_none_match in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+        response = client.get("/resource", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+    # The body was only built for the first request
+    assert len(built) == 1
+
+    response = client.get("/resource", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
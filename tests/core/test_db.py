@@ -0,0 +1,30 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+
+from app.core.db import async_session, get_pool_stats
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_track_checkouts():
+    waits = get_pool_stats()["wait"]["count"]
+    async with async_session() as session:
+        await session.execute(text("SELECT 1"))
+        assert get_pool_stats()["checked_out"] == 1
+
+    stats = get_pool_stats()
+    assert stats["checked_out"] == 0
+    assert stats["wait"]["count"] == waits + 1
+
+
+@pytest.mark.asyncio
+async def test_db_status(async_client: AsyncClient):
+    response = await async_client.get("/status/db")
+    assert response.status_code == 200
+    assert set(response.json()["pool"]) == {
+        "size",
+        "checked_in",
+        "checked_out",
+        "overflow",
+        "wait",
+    }
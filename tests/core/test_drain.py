@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.core.config import settings
+from app.core.db import get_pool_stats
+from app.core.drain import DrainMiddleware, RequestTracker
+from app.main import lifespan
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_in_flight_requests():
+    tracker = RequestTracker()
+    release = asyncio.Event()
+    app = FastAPI()
+    app.add_middleware(DrainMiddleware, tracker=tracker)
+
+    @app.get("/slow")
+    async def slow():
+        await release.wait()
+        return {}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        request = asyncio.create_task(client.get("/slow"))
+        await asyncio.sleep(0.01)
+        assert tracker.in_flight == 1
+
+        drain = asyncio.create_task(tracker.drain(timeout=5))
+        await asyncio.sleep(0.01)
+        response = await client.get("/slow")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert not drain.done()
+
+        release.set()
+        assert (await request).status_code == 200
+        assert await drain
+        assert tracker.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_drain_timeout():
+    tracker = RequestTracker()
+    tracker.enter()
+    assert not await tracker.drain(timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_lifespan_warms_up_pool(monkeypatch):
+    monkeypatch.setattr(settings, "USER_PURGE_ENABLED", False)
+    monkeypatch.setattr(settings, "DB_POOL_WARMUP_SIZE", 2)
+    async with lifespan(FastAPI()):
+        assert get_pool_stats()["checked_in"] >= 2
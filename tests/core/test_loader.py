@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from app.core.loader import BatchLoader
+
+
+class Context:
+    pass
+
+
+@pytest.mark.asyncio
+async def test_loads_of_one_tick_are_batched():
+    calls = []
+
+    async def batch_load(keys, context):
+        calls.append(keys)
+        return {key: key * 2 for key in keys if key != 3}
+
+    loader = BatchLoader(batch_load)
+    contexts = [Context() for _ in range(4)]
+    results = await asyncio.gather(
+        *(loader.load(key, context) for key, context in zip((1, 2, 1, 3), contexts))
+    )
+    assert results == [2, 4, 2, None]
+    assert calls == [[1, 2, 3]]
+
+
+@pytest.mark.asyncio
+async def test_max_batch_size():
+    calls = []
+
+    async def batch_load(keys, context):
+        calls.append(keys)
+        return {key: key for key in keys}
+
+    loader = BatchLoader(batch_load, max_batch_size=2)
+    context = Context()
+    results = await asyncio.gather(*(loader.load(i, context) for i in range(5)))
+    assert results == list(range(5))
+    assert calls == [[0, 1], [2, 3], [4]]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_by_the_other_callers():
+    leader, follower = Context(), Context()
+
+    async def batch_load(keys, context):
+        if context is leader:
+            raise RuntimeError("connection lost")
+        return {key: key for key in keys}
+
+    loader = BatchLoader(batch_load)
+    results = await asyncio.gather(
+        loader.load(1, leader), loader.load(1, follower), return_exceptions=True
+    )
+    assert isinstance(results[0], RuntimeError)
+    assert results[1] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_follower_does_not_cancel_the_load():
+    release = asyncio.Event()
+
+    async def batch_load(keys, context):
+        await release.wait()
+        return {key: key for key in keys}
+
+    loader = BatchLoader(batch_load)
+    first = asyncio.create_task(loader.load(1, Context()))
+    second = asyncio.create_task(loader.load(1, Context()))
+    await asyncio.sleep(0.01)
+    second.cancel()
+    release.set()
+    assert await first == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_stops_its_batch():
+    release = asyncio.Event()
+    loads, stopped = [], []
+    leader, follower = Context(), Context()
+
+    async def batch_load(keys, context):
+        loads.append(context)
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            stopped.append(context)
+            raise
+        return {key: key for key in keys}
+
+    loader = BatchLoader(batch_load)
+    first = asyncio.create_task(loader.load(1, leader))
+    second = asyncio.create_task(loader.load(1, follower))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    # Nothing runs on the leader's context once its call is over
+    assert stopped == [leader]
+    release.set()
+    assert await second == 1
+    assert loads == [leader, follower]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_fails_without_retry_by_its_leader():
+    calls = []
+    leader, follower = Context(), Context()
+
+    async def batch_load(keys, context):
+        calls.append((keys, context))
+        if context is leader:
+            raise RuntimeError("connection lost")
+        return {key: key for key in keys}
+
+    # The batch is dispatched as soon as the leader's key fills it
+    loader = BatchLoader(batch_load, max_batch_size=1)
+    results = await asyncio.gather(
+        loader.load(1, leader), loader.load(1, follower), return_exceptions=True
+    )
+    assert isinstance(results[0], RuntimeError)
+    assert results[1] == 1
+    assert calls == [([1], leader), ([1], follower)]
@@ -0,0 +1,64 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from app.auth.models.user import User
+from app.core.config import settings
+from app.core.db import create_engine
+from app.core.metrics import (
+    Histogram,
+    db_statement_duration,
+    http_request_duration,
+    http_requests,
+)
+
+
+def test_histogram_render():
+    histogram = Histogram("test_seconds", "Test.", ("op",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5, "a")
+    assert histogram.render() == (
+        "# HELP test_seconds Test.\n"
+        "# TYPE test_seconds histogram\n"
+        'test_seconds_bucket{op="a",le="0.1"} 1\n'
+        'test_seconds_bucket{op="a",le="1.0"} 2\n'
+        'test_seconds_bucket{op="a",le="+Inf"} 3\n'
+        'test_seconds_sum{op="a"} 5.55\n'
+        'test_seconds_count{op="a"} 3\n'
+    )
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(async_client: AsyncClient, users: dict[str, User]):
+    route = "/api/v1/auth/users/{target_user_id}"
+    requests = http_requests.get("DELETE", route, "401")
+    observed = http_request_duration.count("DELETE", route)
+
+    response = await async_client.delete(f"/api/v1/auth/users/{users['admin'].id}")
+    assert response.status_code == 401
+    assert http_requests.get("DELETE", route, "401") == requests + 1
+    assert http_request_duration.count("DELETE", route) == observed + 1
+
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        f'http_requests_total{{method="DELETE",route="{route}",status="401"}}'
+        in response.text
+    )
+    assert 'db_pool_connections{state="checked_out"}' in response.text
+    assert 'cache_lookups_total{cache="principal",result="hit"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_statement_timings():
+    engine = create_engine(settings.DB_CONN_STR.unicode_string())
+    observed = db_statement_duration.count("SELECT")
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        with pytest.raises(ProgrammingError):
+            await conn.execute(text("SELECT missing"))
+    await engine.dispose()
+    assert db_statement_duration.count("SELECT") >= observed + 1
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.core.config import settings
+from app.core.constants import Environment
+from app.core.openapi import load_openapi_schema
+
+
+def test_openapi_disabled_in_production(monkeypatch):
+    monkeypatch.setattr(settings, "ENVIRONMENT", Environment.PRODUCTION)
+    assert not settings.openapi_enabled
+    monkeypatch.setattr(settings, "OPENAPI_ENABLED", True)
+    assert settings.openapi_enabled
+
+
+@pytest.mark.asyncio
+async def test_precomputed_openapi_schema(tmp_path):
+    app = FastAPI()
+    path = tmp_path / "openapi.json"
+    schema = {"openapi": "3.1.0", "info": {"title": "Cached", "version": "1"}}
+    path.write_text(json.dumps(schema))
+    load_openapi_schema(app, str(path))
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/openapi.json")
+    assert response.json() == schema
+
+    app = FastAPI()
+    load_openapi_schema(app, str(tmp_path / "missing.json"))
+    assert app.openapi_schema is None
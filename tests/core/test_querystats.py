@@ -0,0 +1,33 @@
+import pytest
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.querystats import describe_parameters, track_queries
+
+
+def test_describe_parameters_hides_values():
+    assert describe_parameters({"email": "a@b.c", "id": 1}) == "{email: str, id: int}"
+    assert describe_parameters(("secret", None)) == "(str, NoneType)"
+    assert describe_parameters([("a",), ("b",)]) == "2 x (str)"
+
+
+@pytest.mark.asyncio
+async def test_track_queries(db_session: AsyncSession, monkeypatch):
+    messages = []
+    handler = logger.add(messages.append, level="WARNING")
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_SECS", 1e-9)
+    try:
+        with track_queries() as outer:
+            with track_queries() as inner:
+                for i in range(3):
+                    await db_session.execute(text("SELECT CAST(:i AS int)"), {"i": i})
+            await db_session.execute(text("SELECT 1"))
+    finally:
+        logger.remove(handler)
+
+    assert inner.count == 3
+    assert outer.count == 4
+    assert list(outer.repeated(3).values()) == [3]
+    assert any("(int)" in message for message in messages)
@@ -0,0 +1,57 @@
+import pytest
+
+from app.core import ratelimit
+from app.core.ratelimit import MemoryRateLimitBackend, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_limit_within_window(clock: FakeClock):
+    limiter = RateLimiter(MemoryRateLimitBackend(shards=4, max_keys=100), 3, 60)
+    assert [await limiter.hit("a") for _ in range(3)] == [0, 0, 0]
+    assert await limiter.check("a") == 60
+    assert await limiter.hit("a") == 60
+    # Checks don't count
+    assert [await limiter.check("c") for _ in range(5)] == [0] * 5
+    assert await limiter.hit("c") == 0
+    # Other keys have their own counters
+    assert await limiter.hit("b") == 0
+
+
+@pytest.mark.asyncio
+async def test_window_slides(clock: FakeClock):
+    limiter = RateLimiter(MemoryRateLimitBackend(shards=4, max_keys=100), 4, 60)
+    for _ in range(4):
+        assert await limiter.hit("a") == 0
+
+    # A second into the next window 59/60 of the previous hits still count
+    clock.now += 61
+    assert await limiter.hit("a") == 0
+    # One previous hit has to slide out of the window
+    assert await limiter.hit("a") == 14
+
+    clock.now += 14.5
+    assert await limiter.hit("a") == 0
+
+
+@pytest.mark.asyncio
+async def test_keys_are_bounded():
+    backend = MemoryRateLimitBackend(shards=2, max_keys=10)
+    limiter = RateLimiter(backend, 1, 60)
+    for i in range(100):
+        await limiter.hit(str(i))
+    assert len(backend) <= 10
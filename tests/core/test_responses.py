@@ -0,0 +1,22 @@
+import json
+import uuid
+from datetime import datetime
+
+from app.auth.models.user import UserRead
+from app.core.responses import ModelJSONResponse
+
+
+def test_model_json_response():
+    user = UserRead(
+        id=uuid.uuid4(), email="jöhn@example.com", is_admin=False, is_active=True
+    )
+    response = ModelJSONResponse(user)
+    assert response.headers["content-type"] == "application/json"
+    assert response.body == user.model_dump_json().encode()
+
+    created_at = datetime(2024, 1, 1)
+    response = ModelJSONResponse({"user": user, "created_at": created_at})
+    assert json.loads(response.body) == {
+        "user": json.loads(user.model_dump_json()),
+        "created_at": "2024-01-01T00:00:00",
+    }
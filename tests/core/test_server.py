@@ -0,0 +1,54 @@
+import asyncio
+import socket
+
+import pytest
+import uvicorn
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.core.drain import RequestTracker
+from app.server import WorkerServer, bind_socket, get_max_requests
+
+
+def test_max_requests_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_MAX_REQUESTS", 0)
+    assert get_max_requests() is None
+
+    monkeypatch.setattr(settings, "SERVER_MAX_REQUESTS", 1000)
+    monkeypatch.setattr(settings, "SERVER_MAX_REQUESTS_JITTER", 50)
+    limits = {get_max_requests() for _ in range(200)}
+    assert min(limits) >= 1000 and max(limits) <= 1050
+    assert len(limits) > 1
+
+
+def test_reuse_port_sockets_share_the_port(monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SERVER_PORT", 0)
+    first = bind_socket(reuse_port=True)
+    monkeypatch.setattr(settings, "SERVER_PORT", first.getsockname()[1])
+    second = bind_socket(reuse_port=True)
+    try:
+        assert second.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT)
+        assert first.getsockname() == second.getsockname()
+    finally:
+        first.close()
+        second.close()
+
+
+@pytest.mark.asyncio
+async def test_worker_drains_before_shutting_down():
+    tracker = RequestTracker()
+    server = WorkerServer(uvicorn.Config(FastAPI()), tracker=tracker)
+    assert not await server.on_tick(1)
+
+    tracker.enter()
+    server.should_exit = True
+    # Still serving, but new requests are refused until the last one is done
+    assert not await server.on_tick(2)
+    await asyncio.sleep(0.01)
+    assert tracker.draining
+    assert not await server.on_tick(3)
+
+    tracker.exit()
+    await asyncio.sleep(0.01)
+    assert await server.on_tick(4)